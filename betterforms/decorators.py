@@ -1,8 +1,99 @@
 # coding: utf-8
 from __future__ import unicode_literals
 
-try:
-    from functools import lru_cache
-except ImportError:
-    from backports.functools_lru_cache import lru_cache
+from collections import namedtuple
+from functools import update_wrapper
 
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses'])
+
+_kwargs_mark = object()
+
+
+class _CacheStats(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses)
+
+
+class cached_property(_CacheStats):
+    """
+    Like ``property``, but the result is computed once per instance and stored
+    in the instance ``__dict__``, so the cache lives (and dies) with the
+    instance. ``del obj.attr`` drops the cached value.
+
+    Hits and misses of all instances are counted on the descriptor, use
+    ``Class.attr.cache_info()`` to read them.
+    """
+
+    def __init__(self, func, name=None):
+        super(cached_property, self).__init__()
+        self.func = func
+        self.name = name or func.__name__
+        update_wrapper(self, func)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            value = instance.__dict__[self.name]
+        except KeyError:
+            self.misses += 1
+            value = instance.__dict__[self.name] = self.func(instance)
+        else:
+            self.hits += 1
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+    def __delete__(self, instance):
+        instance.__dict__.pop(self.name, None)
+
+
+class cached_method(_CacheStats):
+    """
+    Memoizes a method per instance and per arguments. Results are stored in
+    the instance ``__dict__``, arguments must be hashable.
+
+    ``obj.method.cache_clear()`` drops the results of one instance,
+    ``Class.method.cache_info()`` returns hits and misses of all instances.
+    """
+
+    def __init__(self, func):
+        super(cached_method, self).__init__()
+        self.func = func
+        self.cache_name = '_%s_cache' % func.__name__
+        update_wrapper(self, func)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        def method(*args, **kwargs):
+            return self.call(instance, *args, **kwargs)
+
+        def cache_clear():
+            instance.__dict__.pop(self.cache_name, None)
+
+        update_wrapper(method, self.func)
+        method.cache_clear = cache_clear
+        method.cache_info = self.cache_info
+        return method
+
+    def call(self, instance, *args, **kwargs):
+        key = args
+        if kwargs:
+            key += (_kwargs_mark,) + tuple(sorted(kwargs.items()))
+
+        cache = instance.__dict__.setdefault(self.cache_name, {})
+        try:
+            value = cache[key]
+        except KeyError:
+            self.misses += 1
+            value = cache[key] = self.func(instance, *args, **kwargs)
+        else:
+            self.hits += 1
+        return value
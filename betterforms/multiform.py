@@ -1,4 +1,5 @@
 import copy
+import threading
 from itertools import chain
 from operator import add
 
@@ -6,21 +7,30 @@ from django import forms
 from django.forms.forms import BoundField
 from django.core.exceptions import NON_FIELD_ERRORS
 
-from django.db import models
-
-from collections import defaultdict
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, models, router
 
 from django.db.transaction import atomic
-from django.forms.formsets import DELETION_FIELD_NAME, ORDERING_FIELD_NAME
+from django.forms.formsets import DELETION_FIELD_NAME, ORDERING_FIELD_NAME, TOTAL_FORM_COUNT
 from django.forms.models import modelform_factory
 
-from betterforms.utils import classproperty, getattr_path, setattr_path, depth_save_relations
+from betterforms.utils import (
+    classproperty, cached_classproperty, getattr_path, setattr_path, make_hashable, SavePlan,
+    validate_unique_forms, prefetch_model_choices, clear_model_choices, share_model_choices,
+    PrototypeFields, partition_by_prefix, NestedData, NestedFormSetData,
+    asyncio, is_async_callable, then,
+)
 
 try:
     from collections import OrderedDict
 except ImportError:  # Python 2.6, Django < 1.7
     from django.utils.datastructures import SortedDict as OrderedDict  # NOQA
 
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:  # Python 2
+    from collections import Mapping, MutableMapping
+
 try:
     from django.forms.utils import ErrorDict, ErrorList
 except ImportError:  # Django < 1.7
@@ -29,9 +39,15 @@ except ImportError:  # Django < 1.7
 from django.core.exceptions import ValidationError
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.safestring import mark_safe
+from django.utils import timezone, translation
 from django.utils.six.moves import reduce
 
-from .decorators import lru_cache
+from .decorators import cached_property
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2 without the futures backport
+    ThreadPoolExecutor = None
 
 
 class CallbackDict(dict):
@@ -55,6 +71,115 @@ class CallbackDict(dict):
         super(CallbackDict, self).__setitem__(key, value)
 
 
+AMBIGUOUS = object()
+
+
+class FrozenDict(dict):
+    """
+    A dict that can't be changed once it is built, safe to share between
+    instances and threads.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("'%s' object is immutable" % type(self).__name__)
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    # copies are plain, mutable dicts
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class FieldsView(Mapping):
+    """
+    A live, read-through view of the prefixed bound fields of a multiform.
+    Setting an item adds the field to the default form.
+    """
+
+    def __init__(self, multiform):
+        self._multiform = multiform
+
+    def _all_fields(self):
+        self._multiform._build_all_forms()
+        return self._multiform._fields
+
+    def __getitem__(self, name):
+        try:
+            return self._multiform._fields[name]
+        except KeyError:
+            return self._all_fields()[name]
+
+    def __setitem__(self, name, field):
+        self._multiform._set_field(name, field)
+
+    def __contains__(self, name):
+        return name in self._multiform._fields or name in self._all_fields()
+
+    def __iter__(self):
+        return iter(list(self._all_fields()))
+
+    def __len__(self):
+        return len(self._all_fields())
+
+
+class LazyFormDict(MutableMapping):
+    """
+    An ordered mapping of child forms that builds each form the first time it
+    is accessed. ``callback(key, form)`` is called once for every built form.
+    Membership tests and iteration over the keys never build a form.
+    """
+
+    def __init__(self, keys, factory, callback=None):
+        self._keys = list(keys)
+        self._factory = factory
+        self._callback = callback
+        self._forms = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._forms[key]
+        except KeyError:
+            if key not in self:
+                raise
+        form = self._forms[key] = self._factory(key)
+        if callable(self._callback):
+            self._callback(key, form)
+        return form
+
+    def __setitem__(self, key, form):
+        if key not in self:
+            self._keys.append(key)
+        self._forms[key] = form
+        if callable(self._callback):
+            self._callback(key, form)
+
+    def __delitem__(self, key):
+        self._keys.remove(key)
+        self._forms.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def is_built(self, key):
+        return key in self._forms
+
+    def built_items(self):
+        return [(key, self._forms[key]) for key in self._keys if key in self._forms]
+
+
 @python_2_unicode_compatible
 class MultiFormMixin(object):
     """
@@ -66,10 +191,44 @@ class MultiFormMixin(object):
     default_form_key = None
 
     form_classes = {}
-    field_form_map = None
 
     required = None
 
+    #: Validate the child forms concurrently on a thread pool.
+    parallel_validation = False
+    #: The executor used for parallel validation, a new ThreadPoolExecutor
+    #: with ``max_validation_workers`` threads is used for every validation
+    #: when not set.
+    validation_executor = None
+    max_validation_workers = 4
+    #: Run the unique checks of the rows of model formset children with one
+    #: query per constraint instead of one per row and constraint.
+    batch_unique_validation = False
+    #: Resolve the model choices of all the rows of formset children with one
+    #: query per queryset instead of one per row and field.
+    batch_choice_resolution = False
+    #: Evaluate the choices of the model choice fields of all the children
+    #: and formset rows once per distinct queryset when rendering.
+    share_choices = False
+    #: Build the child forms and formset rows from a pristine copy of the
+    #: fields of their class, handing out copy-on-write fields instead of
+    #: deep copying all the fields for every form.
+    prototype_fields = False
+    #: The most rows a formset child may be submitted with, either one number
+    #: for all of them or a dict by form key.  Formsets over it are built
+    #: unbound, without their rows, and a form error is added.
+    max_formset_rows = None
+    #: The most rows all the formset children together may be submitted with.
+    max_total_formset_rows = None
+    _rejected_formsets = frozenset()
+    #: Split ``data`` and ``files`` by the prefixes of the children in one
+    #: pass, every child gets only its own keys.
+    partition_data = False
+    _data_slices = {}
+    #: Accept ``data`` and ``files`` nested by child key: a dict for a form,
+    #: a list of row dicts for a formset.
+    nested_data = False
+
     class Meta:
         fields = None
         exclude = None
@@ -84,8 +243,7 @@ class MultiFormMixin(object):
     def _meta(cls):
         return cls.Meta
 
-    @property
-    @lru_cache(maxsize=30)
+    @cached_property
     def _form_classes(self):
         return self.get_form_classes(*self.args, **self.kwargs)
 
@@ -112,60 +270,154 @@ class MultiFormMixin(object):
         self._init(*args, **kwargs)
 
         self._errors = None
+        self._cleaned_data = None
         self._changed_data = None
         self.empty_permitted = kwargs.get('empty_permitted', False)
 
     def _init(self, *args, **kwargs):
-        self.forms = self.get_forms(*args, **kwargs)
-        self._fields = self._get_fields()
+        self._fields = {}
         self._form_fields = {}
-        self.aliased_fields = self._get_aliased_fields()
-        self.aliased_fields.update(self._get_aliased_forms())
+        self.aliased_fields = {}
+        self._lookup = {}
+        self._rejected_formsets = self.check_formset_rows()
+        if self.partition_data and not self.nested_data:
+            self._data_slices = self.get_data_slices()
+        self.forms = self.get_forms(*args, **kwargs)
+        if not isinstance(self.forms, LazyFormDict):
+            for key, form in self.forms.items():
+                self._index_form(key, form)
+
+    def _index_form(self, key, form):
+        """
+        Adds the fields and the aliases of a freshly built child form to the
+        lookup indexes.
+        """
+        if isinstance(form, forms.BaseFormSet):
+            self._add_alias(key + '_formset', form)
+            return
+
+        self._add_alias(key + '_form', form)
+        for f in form:
+            self._add_bound_field(self._build_field_name(f.name, form.prefix), f)
+
+    def _add_alias(self, name, form):
+        self.aliased_fields[name] = form
+        self._lookup.pop(name, None)
+
+    def _add_bound_field(self, field_name, bound_field):
+        self._fields[field_name] = bound_field
+        self.aliased_fields.setdefault(bound_field.name, []).append(bound_field)
+        self._lookup.pop(field_name, None)
+        self._lookup.pop(bound_field.name, None)
+
+    def _build_all_forms(self):
+        for key in self.forms:
+            self.forms[key]
+
+    @cached_property
+    def lookup_index(self):
+        """
+        Maps every name ``__getitem__`` understands (prefixed field names, bare
+        field names, ``<key>_form`` and ``<key>_formset``) to the keys of the
+        children providing it. Bare names declared by more than one child are
+        marked as ambiguous. The index is compiled once per multiform class,
+        form classes and prefixes.
+        """
+        form_prefixes = self._form_prefixes
+        signature = tuple(
+            (key, self._get_built_form_class(key), form_prefixes[key])
+            for key in self._form_classes
+        )
+        if not self._is_shared_signature(signature):
+            return self._compile_lookup_index(signature)
+        cache = self._get_class_cache('_lookup_indexes')
+        try:
+            return cache[signature]
+        except KeyError:
+            return cache.setdefault(signature, self._compile_lookup_index(signature))
+
+    def _compile_lookup_index(self, signature):
+        owners = OrderedDict()
+        bare_names = {}
+        for form_key, form_class, prefix in signature:
+            if issubclass(form_class, forms.BaseFormSet):
+                owners.setdefault(form_key + '_formset', []).append(form_key)
+                continue
+            owners.setdefault(form_key + '_form', []).append(form_key)
+            for f_name in form_class.base_fields:
+                owners.setdefault(self._build_field_name(f_name, prefix), []).append(form_key)
+                bare_names.setdefault(f_name, []).append(form_key)
+
+        lookup_index = {}
+        for name, keys in bare_names.items():
+            if name not in owners and len(keys) > 1:
+                lookup_index[name] = AMBIGUOUS
+            else:
+                lookup_index[name] = tuple(keys)
+        for name, keys in owners.items():
+            keys.extend(bare_names.get(name, ()))
+            lookup_index[name] = tuple(keys)
+        return FrozenDict(lookup_index)
 
     def _build_field_name(self, name, prefix):
         return "%s_%s" % (prefix, name)
 
-    def _update_field_form_map(self, form_key, form_class):
-        if issubclass(form_class, forms.BaseFormSet):
-            return
-        if self.field_form_map is None:
-            self.field_form_map = {}
+    @classmethod
+    def _get_class_cache(cls, name):
+        """
+        Returns a dict stored on this very class, subclasses don't share it.
+        """
+        cache = cls.__dict__.get(name)
+        if cache is None:
+            cache = {}
+            setattr(cls, name, cache)
+        return cache
 
-        field_form_map = self.field_form_map
-        for f_name, field in form_class.base_fields.items():
-            field_form_map[f_name] = form_key
-            field_form_map[self._build_field_name(f_name, self.get_form_prefix(form_key))] = form_key
+    @cached_property
+    def _form_prefixes(self):
+        return OrderedDict((key, self.get_form_prefix(key)) for key in self._form_classes)
 
-    def _get_aliased_fields(self):
-        fields = defaultdict(list)
-        for form_key, form in self.forms.items():
-            if isinstance(form, forms.BaseFormSet):
-                # fields[form_key].append(form)
-                continue
-            for f in form:
-                fields[f.name].append(f)
-        return dict(fields)
-
-    def _get_aliased_forms(self):
-        _forms_map = defaultdict(list)
-        for f_name, form in self.forms.items():
-            form_key = f_name + '_form'
-            if isinstance(form, forms.BaseFormSet):
-                form_key = f_name + '_formset'
+    def _is_shared_form_class(self, key, form_class):
+        """
+        Whether ``form_class`` outlives this instance: the compiled indexes of
+        per-instance classes (made by ``get_form_classes()``, say) aren't
+        cached on the class, each one would stay there forever.
+        """
+        return self.form_classes.get(key) is form_class
 
-            _forms_map[form_key] = form
-        return _forms_map
+    def _is_shared_signature(self, signature):
+        return all(self._is_shared_form_class(key, form_class) for key, form_class, prefix in signature)
 
-    def _get_fields(self):
-        fields = {}
-        for form_key, form in self.forms.items():
-            if isinstance(form, forms.BaseFormSet):
-                # fields[self._build_field_name(form_key, form.prefix)] = form
-                continue
+    @cached_property
+    def field_form_map(self):
+        """
+        Maps the bare and the prefixed names of the declared child fields to
+        their form keys. The map is compiled once per multiform class, form
+        classes and prefixes and shared read-only between the instances,
+        unless the form classes are made per instance.
+        """
+        form_prefixes = self._form_prefixes
+        signature = tuple(
+            (key, form_class, form_prefixes[key])
+            for key, form_class in self._form_classes.items()
+        )
+        if not self._is_shared_signature(signature):
+            return self._compile_field_form_map(signature)
+        cache = self._get_class_cache('_field_form_maps')
+        try:
+            return cache[signature]
+        except KeyError:
+            return cache.setdefault(signature, self._compile_field_form_map(signature))
 
-            for f in form:
-                fields[self._build_field_name(f.name, form.prefix)] = f
-        return fields
+    def _compile_field_form_map(self, signature):
+        field_form_map = {}
+        for form_key, form_class, prefix in signature:
+            if issubclass(form_class, forms.BaseFormSet):
+                continue
+            for f_name in form_class.base_fields:
+                field_form_map[f_name] = form_key
+                field_form_map[self._build_field_name(f_name, prefix)] = form_key
+        return FrozenDict(field_form_map)
 
     def get_initials(self, initial=None, *args, **kwargs):
         initials = initial or {}
@@ -182,19 +434,194 @@ class MultiFormMixin(object):
         """
         :return: dict
         """
-        return dict(self.form_classes)
+        return OrderedDict(self.form_classes)
 
     def _build_form_class(self, key, base_form_class):
         return base_form_class
 
+    def _get_built_form_class(self, key):
+        """
+        Returns the built class of the child ``key``, built once per instance.
+        """
+        built = self.__dict__.setdefault('_built_form_classes', {})
+        try:
+            return built[key]
+        except KeyError:
+            return built.setdefault(key, self._build_form_class(key, self._form_classes[key]))
+
     def get_forms(self, *args, **kwargs):
-        forms = OrderedDict()
-        for key, form_class in self._form_classes.items():
-            self._update_field_form_map(key, form_class)
-            fargs, fkwargs = self.get_form_args_kwargs(key, form_class, args, kwargs)
+        form_classes = self._form_classes
+
+        def build(key):
+            return self._construct_form(key, form_classes[key], args, kwargs)
+
+        return LazyFormDict(form_classes, build, self._index_form)
+
+    def _construct_form(self, key, form_class, args, kwargs):
+        fargs, fkwargs = self.get_form_args_kwargs(key, form_class, args, kwargs)
+        if key in self._rejected_formsets:
+            fkwargs.update(data=None, files=None)
+        if form_class is self._form_classes.get(key):
+            form_class = self._get_built_form_class(key)
+        else:
             form_class = self._build_form_class(key, form_class)
-            forms[key] = form_class(*fargs, **fkwargs)
-        return forms
+        if self.prototype_fields:
+            form_class = self.get_prototype_class(form_class, cache=self._is_shared_form_class(key, form_class))
+        form = form_class(*fargs, **fkwargs)
+        if isinstance(form, forms.BaseFormSet):
+            self._batch_formset_validation(form)
+        if self.share_choices:
+            self._share_choices(form)
+        return form
+
+    def get_submitted_rows(self, key, form_class):
+        """
+        Returns the number of rows the formset child ``key`` was submitted
+        with, read from its management data.
+        """
+        if self.nested_data:
+            rows = self.data.get(key)
+            return len(rows) if isinstance(rows, (list, tuple)) else 0
+        prefix = self.get_form_prefix(key) or form_class.get_default_prefix()
+        try:
+            return max(int(self.data.get('%s-%s' % (prefix, TOTAL_FORM_COUNT), 0)), 0)
+        except (TypeError, ValueError):
+            # the management form reports it
+            return 0
+
+    def check_formset_rows(self):
+        """
+        Checks the row counts of the formset children against
+        ``max_formset_rows`` and ``max_total_formset_rows`` before any child
+        is built.  Adds a form error for every exceeded budget and returns the
+        keys of the formset children to build unbound.
+        """
+        if self.data is None or (self.max_formset_rows is None and self.max_total_formset_rows is None):
+            return frozenset()
+
+        rows = OrderedDict(
+            (key, self.get_submitted_rows(key, form_class))
+            for key, form_class in self._form_classes.items()
+            if issubclass(form_class, forms.BaseFormSet)
+        )
+        rejected = set()
+        for key, count in rows.items():
+            max_rows = self.max_formset_rows
+            if isinstance(max_rows, dict):
+                max_rows = max_rows.get(key)
+            if max_rows is not None and count > max_rows:
+                rejected.add(key)
+                self.add_crossform_error(ValidationError(
+                    'Too many rows were submitted for %(form)s, at most %(max)s are accepted.',
+                    code='too_many_rows', params={'form': key, 'max': max_rows},
+                ))
+        max_rows = self.max_total_formset_rows
+        if max_rows is not None and sum(rows.values()) > max_rows:
+            rejected.update(rows)
+            self.add_crossform_error(ValidationError(
+                'Too many rows were submitted, at most %(max)s are accepted in total.',
+                code='too_many_rows', params={'max': max_rows},
+            ))
+        return frozenset(rejected)
+
+    @classmethod
+    def get_prototype_class(cls, form_class, cache=True):
+        """
+        Returns a subclass of the form or formset class ``form_class`` whose
+        forms get copy-on-write fields, see ``prototype_fields``. The classes
+        are cached per multiform class unless ``cache`` is false, nested
+        multiforms are returned as is.
+        """
+        if issubclass(form_class, MultiFormMixin):
+            return form_class
+        classes = cls._get_class_cache('_prototype_classes') if cache else {}
+        prototype_class = classes.get(form_class)
+        if prototype_class is None:
+            if issubclass(form_class, forms.BaseFormSet):
+                attrs = {'form': cls.get_prototype_class(form_class.form, cache=cache)}
+                prototype_class = type(form_class)(form_class.__name__, (form_class,), attrs)
+            else:
+                prototype_class = type(form_class)(form_class.__name__, (form_class,), {})
+                # set after the class is created, the metaclass of model forms
+                # would build the fields again
+                prototype_class.base_fields = PrototypeFields(form_class.base_fields)
+            prototype_class.__module__ = form_class.__module__
+            prototype_class = classes.setdefault(form_class, prototype_class)
+        return prototype_class
+
+    def get_choice_cache(self):
+        """
+        Returns the dict the choices of the model choice fields are shared in
+        with ``share_choices``. One per multiform, override it to share the
+        choices between multiforms, e.g. during a request.
+        """
+        cache = self.__dict__.get('_choice_cache')
+        if cache is None:
+            cache = self._choice_cache = {}
+        return cache
+
+    def _share_choices(self, form):
+        if isinstance(form, forms.BaseFormSet):
+            construct_form = form._construct_form
+
+            def shared_construct_form(i, **kwargs):
+                row = construct_form(i, **kwargs)
+                self._share_choices(row)
+                return row
+
+            form._construct_form = shared_construct_form
+        elif not isinstance(form, MultiFormMixin):
+            share_model_choices(form, self.get_choice_cache())
+
+    def _batch_formset_validation(self, formset):
+        """
+        Wraps ``formset.full_clean`` to validate the rows in batches: with
+        ``batch_choice_resolution`` the chosen model objects of all the rows
+        are loaded up front, with ``batch_unique_validation`` the rows of a
+        model formset skip their unique checks while they are cleaned and
+        these run for all the rows at once, right before ``formset.clean()``
+        like the rows would have.
+        """
+        batch_unique = self.batch_unique_validation and isinstance(formset, forms.BaseModelFormSet)
+        if not (batch_unique or self.batch_choice_resolution):
+            return
+
+        full_clean = formset.full_clean
+        clean = formset.clean
+        pending = []
+
+        def defer(row):
+            def validate_unique():
+                pending.append(row)
+            return validate_unique
+
+        def validate_pending():
+            rows = pending[:]
+            del pending[:]
+            validate_unique_forms(rows)
+
+        def batched_clean():
+            validate_pending()
+            return clean()
+
+        def batched_full_clean():
+            rows = [row for row in formset.forms if not isinstance(row, MultiFormMixin)]
+            choice_fields = prefetch_model_choices(rows) if self.batch_choice_resolution else []
+            model_rows = [row for row in rows if batch_unique and isinstance(row, forms.BaseModelForm)]
+            for row in model_rows:
+                row.validate_unique = defer(row)
+            formset.clean = batched_clean
+            try:
+                full_clean()
+                # clean() isn't called when the number of rows is invalid
+                validate_pending()
+            finally:
+                clear_model_choices(choice_fields)
+                for row in model_rows:
+                    del row.validate_unique
+                del formset.clean
+
+        formset.full_clean = batched_full_clean
 
     def get_form_prefix(self, form_key):
         prefix = self.kwargs.get('prefix')
@@ -214,25 +641,122 @@ class MultiFormMixin(object):
             initial=self.initials.get(key),
             prefix=self.get_form_prefix(key),
         )
+        if self.nested_data:
+            fkwargs.update(self.get_nested_data(key, form_class, fkwargs))
+        elif key in self._data_slices:
+            fkwargs['data'], fkwargs['files'] = self._data_slices[key]
         return args, fkwargs
 
+    def get_nested_data(self, key, form_class, fkwargs):
+        """
+        Returns the ``data`` and ``files`` of the child ``key`` with
+        ``nested_data``: its part of the nested data, presented to it as flat
+        form data without copying.  Nested multiforms get their part as is.
+        """
+        is_formset = issubclass(form_class, forms.BaseFormSet)
+        prefix = fkwargs.get('prefix')
+        if is_formset:
+            prefix = prefix or form_class.get_default_prefix()
+
+        nested = {}
+        for name, data in (('data', self.data), ('files', self.files)):
+            if data is None:
+                nested[name] = None
+                continue
+            data = data.get(key, [] if is_formset else {})
+            if issubclass(form_class, MultiFormMixin):
+                nested[name] = data
+            elif is_formset:
+                if not isinstance(data, (list, tuple)):
+                    self.add_crossform_error(ValidationError(
+                        'Expected a list of rows for %(form)s.',
+                        code='invalid_nested_data', params={'form': key},
+                    ))
+                    data = []
+                initial_forms = self.get_initial_row_count(form_class, data, fkwargs.get('initial'))
+                if issubclass(form_class, forms.BaseModelFormSet) and any(
+                    isinstance(row, Mapping) and row.get(form_class.model._meta.pk.name) not in (None, '')
+                    for row in data[initial_forms:]
+                ):
+                    # the formset would save such a row as a new object
+                    self.add_crossform_error(ValidationError(
+                        'Rows with a primary key must come first in %(form)s.',
+                        code='invalid_nested_data', params={'form': key},
+                    ))
+                    data, initial_forms = [], 0
+                nested[name] = NestedFormSetData(data, prefix, initial_forms)
+            else:
+                if not isinstance(data, Mapping):
+                    self.add_crossform_error(ValidationError(
+                        'Expected an object for %(form)s.',
+                        code='invalid_nested_data', params={'form': key},
+                    ))
+                    data = {}
+                nested[name] = NestedData(data, prefix)
+        return nested
+
+    def get_initial_row_count(self, form_class, rows, initial):
+        """
+        Returns how many of the nested ``rows`` of a formset child are initial
+        forms: the leading rows with a primary key for model formsets, the
+        rows with initial data for the others.
+        """
+        if not issubclass(form_class, forms.BaseModelFormSet):
+            return len(initial or ())
+        pk_name = form_class.model._meta.pk.name
+        count = 0
+        for row in rows:
+            if not isinstance(row, Mapping) or row.get(pk_name) in (None, ''):
+                break
+            count += 1
+        return count
+
+    def get_data_slices(self):
+        """
+        Returns the ``data`` and ``files`` of every child with
+        ``partition_data``, by form key. Nested multiforms get all of it, the
+        prefixes of their children don't start with theirs.
+        """
+        prefixes = OrderedDict(
+            (key, prefix) for key, prefix in self._form_prefixes.items()
+            if not issubclass(self._form_classes[key], MultiFormMixin)
+        )
+        data = partition_by_prefix(self.data, prefixes.values())
+        files = partition_by_prefix(self.files, prefixes.values())
+        return dict((key, (data[prefix], files[prefix])) for key, prefix in prefixes.items())
+
     def __str__(self):
         return self.as_table()
 
-    @property
+    @cached_property
     def fields(self):
-        def set_callback(_d, key, field):
-            self._set_field(key, field)
-            return False
-
-        return CallbackDict(self._fields, set_callback=set_callback)
+        return FieldsView(self)
 
     def _get_field(self, name):
         try:
-            return self.fields[name]
+            return self._lookup[name]
+        except KeyError:
+            pass
+
+        keys = self.lookup_index.get(name)
+        if keys is AMBIGUOUS:
+            raise KeyError("Fields '%s' more than 1" % name)
+        if isinstance(self.forms, LazyFormDict):
+            # Names that aren't declared on the form classes may only exist
+            # at runtime, so every child has to be built for them.
+            for key in (self.forms if keys is None else keys):
+                self.forms[key]
+
+        field = self._resolve_field(name)
+        self._lookup[name] = field
+        return field
+
+    def _resolve_field(self, name):
+        try:
+            return self._fields[name]
         except KeyError:
             fields = self.aliased_fields[name]
-            if isinstance(fields, (forms.BaseFormSet, forms.BaseForm)):
+            if not isinstance(fields, list):
                 return fields
 
             if len(fields) > 1:
@@ -243,13 +767,7 @@ class MultiFormMixin(object):
         default_form = self.default_form
         default_form.fields[name] = field
         bound_field = default_form[name]
-
-        if name not in self.aliased_fields:
-            self.aliased_fields[name] = []
-
-        self.aliased_fields[name].append(bound_field)
-        field_name = self._build_field_name(name, self.prefix)
-        self._fields[field_name] = bound_field
+        self._add_bound_field(self._build_field_name(name, self.prefix), bound_field)
 
     def __getitem__(self, key):
         return self._get_field(key)
@@ -296,7 +814,7 @@ class MultiFormMixin(object):
 
     def clean_forms(self):
         required_forms = self.get_required_forms()
-        forms = dict(self.forms)
+        forms = OrderedDict(self.forms.items())
         for key, form in forms.items():
             if not form.has_changed() and key not in required_forms:
                 del forms[key]
@@ -310,7 +828,86 @@ class MultiFormMixin(object):
             setattr(self, '_cleaned_forms', cleaned_forms)
         return cleaned_forms
 
+    def get_validation_executor(self):
+        """
+        Returns a two-tuple of the executor for parallel validation and whether
+        it has to be shut down once the validation is done.
+        """
+        if self.validation_executor is not None:
+            return self.validation_executor, False
+        if ThreadPoolExecutor is None:
+            raise ImproperlyConfigured(
+                "parallel_validation requires concurrent.futures, install the "
+                "'futures' package on Python 2."
+            )
+        workers = min(self.max_validation_workers, len(self.cleaned_forms)) or 1
+        return ThreadPoolExecutor(max_workers=workers), True
+
+    def _clean_children(self):
+        """
+        Runs ``full_clean`` of every child form that will be validated. Does
+        nothing unless ``parallel_validation`` is enabled, the children then
+        clean themselves lazily.
+        """
+        if not self.parallel_validation:
+            return
+        children = [form for form in self.cleaned_forms.values() if form._errors is None]
+        if len(children) < 2:
+            return
+
+        executor, shutdown = self.get_validation_executor()
+        caller = threading.current_thread()
+        context = self._get_thread_context()
+        try:
+            futures = [
+                executor.submit(self._clean_child, form, caller, shutdown, context)
+                for form in children
+            ]
+            # Wait for all of them and raise the first exception in the order
+            # of the children, just like the serial validation.
+            for future in futures:
+                future.exception()
+            for future in futures:
+                future.result()
+        finally:
+            if shutdown:
+                executor.shutdown(wait=True)
+
+    def _get_thread_context(self):
+        """
+        Returns the current timezone and language of the calling thread, they
+        are activated in the threads cleaning the children so that the values
+        are parsed as in a serial validation.
+        """
+        return timezone.get_current_timezone(), translation.get_language()
+
+    def _clean_child(self, form, caller, owned=False, context=None):
+        current_timezone, language = context or self._get_thread_context()
+        try:
+            with timezone.override(current_timezone), translation.override(language):
+                form.errors
+        finally:
+            self._close_thread_connections(caller, owned)
+
+    def _close_thread_connections(self, caller, owned=False):
+        """
+        Database connections are per thread. The threads of a pool ``owned``
+        by the call go away with it, their connections are closed. In the
+        threads of a long-lived executor only the connections that are
+        unusable or older than ``CONN_MAX_AGE`` are, like at the end of a
+        request.
+        """
+        if threading.current_thread() is caller:
+            return
+        if owned:
+            for connection in connections.all():
+                connection.close()
+        else:
+            close_old_connections()
+
     def full_clean(self):
+        self._clear_cleaned_data()
+        self._clean_children()
         errors = ErrorDict()
         for form in self.cleaned_forms.values():
             if form.errors:
@@ -330,10 +927,44 @@ class MultiFormMixin(object):
                             errors[_k].extend(error_list)
         return errors
 
+    def nested_errors(self):
+        """
+        Returns the errors in the shape of the nested data: the errors of a
+        form by field under its key, the list of the row errors of a formset
+        under its key.  The errors of the multiform and the non-form errors of
+        the formsets are listed under ``NON_FIELD_ERRORS``.
+        """
+        def as_lists(form_errors):
+            return dict((name, list(error_list)) for name, error_list in form_errors.items())
+
+        errors = OrderedDict()
+        non_field_errors = list(self.error_class(self.crossform_errors))
+        for key, form in self.cleaned_forms.items():
+            if isinstance(form, MultiFormMixin):
+                form_errors = form.nested_errors()
+            elif isinstance(form, forms.BaseFormSet):
+                form_errors = [as_lists(row_errors) for row_errors in form.errors]
+                if not any(form_errors):
+                    form_errors = None
+                non_field_errors.extend(form.non_form_errors())
+            else:
+                form_errors = as_lists(form.errors)
+            if form_errors:
+                errors[key] = form_errors
+        if non_field_errors:
+            errors[NON_FIELD_ERRORS] = non_field_errors
+        return errors
+
     def add_crossform_error(self, e):
         self.crossform_errors.append(e)
+        self._clear_cleaned_data()
+
+    def _clear_cleaned_data(self):
+        self._cleaned_data = None
 
     def is_valid(self):
+        self._clear_cleaned_data()
+        self._clean_children()
         forms_valid = all(form.is_valid() for form in self.cleaned_forms.values())
 
         try:
@@ -341,23 +972,163 @@ class MultiFormMixin(object):
         except ValidationError as e:
             self.add_crossform_error(e)
         else:
-            if cleaned_data is not None:
-                for key, data in cleaned_data.items():
-                    form = self.forms[key]
-                    if isinstance(form, forms.BaseFormSet):
-                        map_data = {}
-                        for d in data:
-                            _ins = d.get('id')
-                            if _ins:
-                                map_data['id'] = _ins.id
-
-                        for i, _form in enumerate(form.forms):
-                            obj_id = _form.instance and _form.instance.id
-                            _form.cleaned_data = map_data.get(obj_id) or data[i]
-                    else:
-                        self.forms[key].cleaned_data = data
+            self._apply_clean_result(cleaned_data)
         return forms_valid and not self.crossform_errors
 
+    def _apply_clean_result(self, cleaned_data):
+        if cleaned_data is not None:
+            for key, data in cleaned_data.items():
+                form = self.forms[key]
+                if isinstance(form, forms.BaseFormSet):
+                    self._set_formset_cleaned_data(form, data)
+                else:
+                    form.cleaned_data = data
+            self._clear_cleaned_data()
+
+    def _set_formset_cleaned_data(self, formset, rows):
+        """
+        Assigns the cleaned data ``rows`` to the forms of ``formset``. The rows
+        of a model formset are matched to the forms by the primary key of their
+        instance; the rows without a primary key are assigned in order to the
+        forms without an instance, like the rows of other formsets. The forms
+        of an instance without a row keep their cleaned data.
+        """
+        rows_by_pk = {}
+        new_rows = []
+        if isinstance(formset, forms.BaseModelFormSet):
+            pk_name = formset.model._meta.pk.name
+            for row in rows:
+                pk = getattr(row.get(pk_name), 'pk', row.get(pk_name))
+                if pk is None:
+                    new_rows.append(row)
+                else:
+                    rows_by_pk[pk] = row
+        else:
+            new_rows = list(rows)
+
+        new_rows = iter(new_rows)
+        for form in formset.forms:
+            instance = getattr(form, 'instance', None)
+            pk = instance.pk if instance is not None else None
+            if pk is not None:
+                if pk in rows_by_pk:
+                    form.cleaned_data = rows_by_pk[pk]
+                continue
+            for row in new_rows:
+                form.cleaned_data = row
+                break
+
+    def ais_valid(self):
+        """
+        Asynchronous variant of :meth:`is_valid`, returns an awaitable. The
+        children are cleaned concurrently with :meth:`afull_clean` and
+        :meth:`clean` may be a coroutine function.
+        """
+        loop = self._get_event_loop()
+
+        def validate(errors):
+            forms_valid = all(form.is_valid() for form in self.cleaned_forms.values())
+
+            def on_clean_error(e):
+                if not isinstance(e, ValidationError):
+                    raise e
+                self.add_crossform_error(e)
+                return forms_valid and not self.crossform_errors
+
+            def on_cleaned(cleaned_data):
+                self._apply_clean_result(cleaned_data)
+                return forms_valid and not self.crossform_errors
+
+            try:
+                cleaned_data = self.clean()
+            except ValidationError as e:
+                return on_clean_error(e)
+            return then(cleaned_data, on_cleaned, loop, errback=on_clean_error)
+
+        return then(self.afull_clean(), validate, loop)
+
+    def afull_clean(self):
+        """
+        Asynchronous variant of :meth:`full_clean`, returns an awaitable
+        resolving to the errors. The children are cleaned concurrently, each
+        one by a call of its ``full_clean`` on ``validation_executor`` (the
+        default executor of the loop if not set). Their coroutine function
+        field validators and ``clean`` methods run on the loop, in the order
+        Django calls them, while the worker thread waits for them.
+        """
+        loop = self._get_event_loop()
+        self._clear_cleaned_data()
+        children = [form for form in self.cleaned_forms.values() if form._errors is None]
+        cleaned = asyncio.gather(*[self._aclean_child(form, loop) for form in children])
+
+        def collect_errors(results):
+            self._errors = self.full_clean()
+            return self._errors
+
+        return then(cleaned, collect_errors, loop)
+
+    def _get_event_loop(self):
+        if asyncio is None:
+            raise ImproperlyConfigured("The asynchronous API requires asyncio (Python 3).")
+        return asyncio.get_event_loop()
+
+    def _aclean_child(self, form, loop):
+        if isinstance(form, MultiFormMixin):
+            return form.afull_clean()
+
+        rows = self._get_plain_forms(form)
+        caller = threading.current_thread()
+        context = self._get_thread_context()
+
+        def clean_sync():
+            restores = [self._bridge_async_hooks(row, loop) for row in rows]
+            try:
+                self._clean_child(form, caller, context=context)
+            finally:
+                for restore in restores:
+                    restore()
+
+        return loop.run_in_executor(self.validation_executor, clean_sync)
+
+    def _get_plain_forms(self, form):
+        """
+        Returns the forms cleaned along with the child ``form``: the child
+        itself, the rows of a formset, the children of multiform rows.
+        """
+        if isinstance(form, MultiFormMixin):
+            return [row for child in form.forms.values() for row in self._get_plain_forms(child)]
+        if isinstance(form, forms.BaseFormSet):
+            return [row for row_form in form.forms for row in self._get_plain_forms(row_form)]
+        return [form]
+
+    def _bridge_async_hooks(self, form, loop):
+        """
+        Replaces the coroutine function validators and ``clean`` method of
+        ``form`` by functions running them on ``loop`` and waiting for their
+        result, so that ``full_clean`` calls them from a worker thread where
+        Django calls the synchronous ones. Returns a function undoing it.
+        """
+        def bridge(func):
+            def wait(*args):
+                return asyncio.run_coroutine_threadsafe(func(*args), loop).result()
+            return wait
+
+        validators = []
+        for field in form.fields.values():
+            if any(is_async_callable(v) for v in field.validators):
+                validators.append((field, field.validators))
+                field.validators = [bridge(v) if is_async_callable(v) else v for v in field.validators]
+        clean = is_async_callable(form.clean)
+        if clean:
+            form.clean = bridge(form.clean)
+
+        def restore():
+            for field, original_validators in validators:
+                field.validators = original_validators
+            if clean:
+                del form.clean
+        return restore
+
     def non_field_errors(self):
         form_errors = (
             form.non_field_errors() for form in self.forms.values()
@@ -391,36 +1162,31 @@ class MultiFormMixin(object):
 
     @property
     def cleaned_data(self):
-        return OrderedDict(
-            (key, form.cleaned_data)
-            for key, form in self.cleaned_forms.items() if form.is_valid()
-        )
+        if self._cleaned_data is None:
+            self._cleaned_data = OrderedDict(
+                (key, form.cleaned_data)
+                for key, form in self.cleaned_forms.items() if form.is_valid()
+            )
+        return self._cleaned_data
 
     @cleaned_data.setter
     def cleaned_data(self, data):
-        for key, value in data.items():
-            form = self.forms[key]
-            if isinstance(form, forms.BaseFormSet):
-                map_data = {}
-                for d in value:
-                    _ins = d.get('id')
-                    if _ins:
-                        map_data['id'] = _ins.id
-
-                for i, _form in enumerate(form.forms):
-                    obj_id = _form.instance and _form.instance.id
-                    _form.cleaned_data = map_data.get(obj_id) or value[i]
-            else:
-                form.cleaned_data = value
+        self._apply_clean_result(data)
 
-    @classproperty
+    @cached_classproperty('form_classes')
     def base_fields(cls):
-        # TODO dynamic fields
-        base_fields = {}
-        for form_key, form in cls.form_classes.items():
-            for f_name, field in form.base_fields.items():
+        """
+        The fields of all child form classes, including the row fields of the
+        formsets, prefixed with their form keys. Computed once per class, read
+        only.
+        """
+        base_fields = OrderedDict()
+        for form_key, form_class in cls.form_classes.items():
+            if issubclass(form_class, forms.BaseFormSet):
+                form_class = form_class.form
+            for f_name, field in form_class.base_fields.items():
                 base_fields['_'.join([form_key, f_name])] = field
-        return base_fields
+        return FrozenDict(base_fields)
 
     @property
     def default_key(self):
@@ -435,6 +1201,13 @@ class MultiModelFormMixin(MultiFormMixin):
     """
 
     default_instance_key = None
+    save_executor = None
+    bulk_save = False
+    full_row_save = True
+    atomic_save = True
+    save_savepoints = False
+    _save_plan = None
+    _cleaned_objects = None
 
     class Meta(MultiFormMixin.Meta):
         model = None
@@ -453,8 +1226,6 @@ class MultiModelFormMixin(MultiFormMixin):
         # default instance
         self.instance = self.get_default_instance()
         super(MultiModelFormMixin, self).__init__(*args, **kwargs)
-        if self.kwargs['data']:
-            self._init(*self.args, **self.kwargs)
 
     def get_instances(self, instance=None, *args, **kwargs):
         instances_map = instance or {}
@@ -516,9 +1287,60 @@ class MultiModelFormMixin(MultiFormMixin):
                 # maybe admin.site
                 defaults['formfield_callback'] = getattr(self, 'formfield_callback', None)
             defaults['form'] = base_form_class
-            return modelform_factory(model, **defaults)
+            return self._get_model_form_class(form_key, model, defaults)
         return base_form_class
 
+    def _is_shared_form_class(self, key, form_class):
+        return (
+            super(MultiModelFormMixin, self)._is_shared_form_class(key, form_class) or
+            form_class in self.get_form_class_cache().values()
+        )
+
+    def _get_model_form_class(self, form_key, model, defaults):
+        callback = defaults.get('formfield_callback')
+        if getattr(callback, '__self__', None) is self:
+            # The callback is bound to this very instance, the generated class
+            # can't be shared with other instances.
+            return modelform_factory(model, **defaults)
+        if not super(MultiModelFormMixin, self)._is_shared_form_class(form_key, defaults['form']):
+            # neither can a class made from a per-instance class
+            return modelform_factory(model, **defaults)
+
+        try:
+            cache_key = (form_key, model, make_hashable(defaults))
+            hash(cache_key)
+        except TypeError:
+            return modelform_factory(model, **defaults)
+
+        cache = self.get_form_class_cache()
+        form_class = cache.get(cache_key)
+        if form_class is None:
+            form_class = cache.setdefault(cache_key, modelform_factory(model, **defaults))
+        return form_class
+
+    @classmethod
+    def get_form_class_cache(cls):
+        """
+        Returns the cache of generated child form classes of this multiform
+        class. Every subclass has its own cache.
+        """
+        return cls._get_class_cache('_form_class_cache')
+
+    @classmethod
+    def clear_form_class_cache(cls, form_key=None):
+        """
+        Drops the generated child form classes, either all of them or only the
+        ones for ``form_key``. Use it when the ``Meta`` options or the child
+        form classes are changed at runtime.
+        """
+        cache = cls.get_form_class_cache()
+        if form_key is None:
+            cache.clear()
+            return
+        for cache_key in list(cache):
+            if cache_key[0] == form_key:
+                cache.pop(cache_key, None)
+
     def get_form_args_kwargs(self, key, form_class, args, kwargs):
         fargs, fkwargs = super(MultiModelFormMixin, self).get_form_args_kwargs(key, form_class, args, kwargs)
         try:
@@ -548,23 +1370,43 @@ class MultiModelFormMixin(MultiFormMixin):
                     continue
 
                 setattr_path(obj, sub_key, sub_obj)
+                changed = getattr(obj, 'DO_CHANGED', None)
+                if changed is not None and sub_key not in changed and sub_key in self._get_field_names(obj):
+                    changed.append(sub_key)
         else:
             if commit:
+                plan = self._save_plan or self.get_save_plan()
                 if isinstance(obj, list):
                     new_obj_list = []
                     for o in obj:
                         if getattr(o, 'DO_DELETE', False):
-                            o.delete()
+                            plan.delete(o)
                         else:
-                            depth_save_relations(o)
+                            plan.add(o, self.get_update_fields(o, bulk=self.bulk_save))
                             new_obj_list.append(o)
                     obj = new_obj_list
                 else:
-                    depth_save_relations(obj)
+                    plan.add(obj, self.get_update_fields(obj))
+                if plan is not self._save_plan:
+                    plan.execute()
         return obj
 
     @property
     def cleaned_objects(self):
+        """
+        The objects of the child model forms, built with ``save(commit=False)``
+        once and kept until the multiform is cleaned again or its cleaned data
+        is assigned.
+        """
+        if self._cleaned_objects is None:
+            self._cleaned_objects = self.get_cleaned_objects()
+        return self._cleaned_objects
+
+    def _clear_cleaned_data(self):
+        super(MultiModelFormMixin, self)._clear_cleaned_data()
+        self._cleaned_objects = None
+
+    def get_cleaned_objects(self):
         objects = OrderedDict()
         for key, form in self.cleaned_forms.items():
             if isinstance(form, forms.BaseFormSet):
@@ -582,31 +1424,92 @@ class MultiModelFormMixin(MultiFormMixin):
                         is_delete = c_data.get(DELETION_FIELD_NAME)
                         setattr(obj, 'DO_DELETE', is_delete)
                         setattr(obj, 'DO_ORDER', c_data.get(ORDERING_FIELD_NAME))
+                        setattr(obj, 'DO_CHANGED', self.get_changed_fields(f, obj))
                         obj_list.append(obj)
 
                 objects[key] = obj_list
             else:
                 if isinstance(form, forms.BaseModelForm):
-                    objects[key] = form.save(commit=False)
+                    obj = form.save(commit=False)
+                    setattr(obj, 'DO_CHANGED', self.get_changed_fields(form, obj))
+                    objects[key] = obj
         return objects
 
+    def get_changed_fields(self, form, obj):
+        """
+        Returns the names of the concrete fields of ``obj`` edited in ``form``,
+        ``None`` when they can't be told.
+        """
+        if isinstance(form, MultiFormMixin):
+            # The changed data of the children are mixed up
+            return None
+        changed = set(form.changed_data)
+        return [name for name in self._get_field_names(obj) if name in changed]
+
+    def _get_field_names(self, obj):
+        return [field.name for field in obj._meta.concrete_fields if not field.primary_key]
+
+    def get_update_fields(self, obj, bulk=False):
+        """
+        Returns the names of the fields written when saving ``obj``: ``None``
+        (all of them) for new objects or with ``full_row_save``, otherwise the
+        changed fields and the ``auto_now`` ones. The formset rows saved in
+        ``bulk`` always get their changed fields. An empty list means ``obj``
+        is left untouched.
+        """
+        changed = getattr(obj, 'DO_CHANGED', None)
+        if (self.full_row_save and not bulk) or obj._state.adding or changed is None:
+            return None
+        if not changed:
+            return []
+        auto_now = [field.name for field in obj._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        return list(changed) + [name for name in auto_now if name not in changed]
+
+    def get_save_plan(self):
+        """
+        Returns the :class:`~betterforms.utils.SavePlan` the objects are saved
+        with.
+        """
+        return SavePlan(bulk=self.bulk_save, savepoints=self.save_savepoints)
+
+    def get_save_database(self, objects):
+        """
+        Returns the alias of the database the transaction of
+        :meth:`save_multiform` is opened on.
+        """
+        instance = objects.get(self.default_key)
+        if instance is None:
+            return DEFAULT_DB_ALIAS
+        return router.db_for_write(type(instance), instance=instance)
+
     def save_objects(self, objects, commit=True):
         default_key = self.default_key
-        for key, obj in objects.items():
-            if key == default_key:
-                continue
-            self.save_object(obj, key, objects, commit=commit)
+        # The children are collected in one plan and saved together with the
+        # default instance, model by model.
+        self._save_plan = self.get_save_plan() if commit else None
+        try:
+            for key, obj in objects.items():
+                if key == default_key:
+                    continue
+                self.save_object(obj, key, objects, commit=commit)
 
-        instance = objects[default_key]
-        self.save_object(instance, default_key, objects, commit=commit)
-        if commit:
-            instance.save()
+            instance = objects[default_key]
+            self.save_object(instance, default_key, objects, commit=commit)
+            if commit:
+                self._save_plan.add(instance, self.get_update_fields(instance))
+                self._save_plan.execute()
+        finally:
+            self._save_plan = None
 
         return objects
 
     def save_multiform(self, commit=True):
         objects = self.cleaned_objects
-        objects = self.save_objects(objects, commit=commit)
+        if commit and self.atomic_save:
+            with atomic(using=self.get_save_database(objects)):
+                objects = self.save_objects(objects, commit=commit)
+        else:
+            objects = self.save_objects(objects, commit=commit)
 
         if any(hasattr(form, 'save_m2m') for form in self.cleaned_forms.values()):
             def save_m2m():
@@ -622,6 +1525,43 @@ class MultiModelFormMixin(MultiFormMixin):
         objects = self.save_multiform(commit=commit)
         return objects[self.default_key]
 
+    def asave_multiform(self, commit=True):
+        """
+        Asynchronous variant of :meth:`save_multiform`, returns an awaitable
+        resolving to the objects. The ORM is synchronous, so the whole
+        :meth:`save_multiform` runs in one call on ``save_executor`` (the
+        default executor of the loop if not set) and the children are still
+        saved before the default instance.
+        """
+        return self._run_in_save_executor(self.save_multiform, commit)
+
+    def asave(self, commit=True):
+        """
+        Asynchronous variant of :meth:`save`, returns an awaitable resolving to
+        the default instance.
+        """
+        return then(self.asave_multiform(commit=commit),
+                    lambda objects: objects[self.default_key], self._get_event_loop())
+
+    def asave_m2m(self):
+        """
+        Asynchronous variant of ``save_m2m``, available after saving with
+        ``commit=False``.
+        """
+        return self._run_in_save_executor(self.save_m2m)
+
+    def _run_in_save_executor(self, func, *args):
+        loop = self._get_event_loop()
+        caller = threading.current_thread()
+
+        def run():
+            try:
+                return func(*args)
+            finally:
+                self._close_thread_connections(caller)
+
+        return loop.run_in_executor(self.save_executor, run)
+
     @property
     def default_key(self):
         return self.default_instance_key or self.default_form_key
@@ -0,0 +1,58 @@
+# coding: utf-8
+import gc
+import weakref
+from unittest import TestCase
+
+from ..decorators import cached_property, cached_method
+
+
+class Counter(object):
+    calls = 0
+
+    @cached_property
+    def value(self):
+        self.calls += 1
+        return self.calls
+
+    @cached_method
+    def add(self, a, b=0):
+        self.calls += 1
+        return a + b
+
+
+class DecoratorsTest(TestCase):
+    def test_cached_property(self):
+        info = Counter.value.cache_info()
+        obj = Counter()
+        self.assertEqual(obj.value, 1)
+        self.assertEqual(obj.value, 1)
+        self.assertEqual(Counter.value.cache_info().misses, info.misses + 1)
+        self.assertEqual(Counter.value.cache_info().hits, info.hits + 1)
+
+        del obj.value
+        self.assertEqual(obj.value, 2)
+
+        obj.value = 10
+        self.assertEqual(obj.value, 10)
+
+    def test_cached_method(self):
+        obj = Counter()
+        self.assertEqual(obj.add(1, b=2), 3)
+        self.assertEqual(obj.add(1, b=2), 3)
+        self.assertEqual(obj.calls, 1)
+        self.assertEqual(obj.add(1), 1)
+        self.assertEqual(obj.calls, 2)
+
+        obj.add.cache_clear()
+        obj.add(1, b=2)
+        self.assertEqual(obj.calls, 3)
+        self.assertEqual(obj.add.cache_info(), Counter.add.cache_info())
+
+    def test_no_strong_references(self):
+        obj = Counter()
+        obj.value
+        obj.add(1)
+        ref = weakref.ref(obj)
+        del obj
+        gc.collect()
+        self.assertIsNone(ref())
@@ -1,7 +1,10 @@
 # coding: utf-8
-from unittest import TestCase
+from unittest import TestCase, skipIf
 
-from ..utils import _getattr_path, getattr_path, setattr_path
+from ..utils import (
+    _getattr_path, getattr_path, setattr_path, make_hashable, cached_classproperty,
+    asyncio, as_future, then,
+)
 
 
 class UtilTest(TestCase):
@@ -33,6 +36,48 @@ class UtilTest(TestCase):
         setattr_path(a, 'a.b._test', test2)
         self.assertEqual(getattr_path(a, 'a.b._test'), test2)
 
+    def test_make_hashable(self):
+        value = {'b': [1, 2], 'a': {'c': (3, [4])}}
+        self.assertEqual(make_hashable(value), (('a', (('c', (3, (4,))),)), ('b', (1, 2))))
+        self.assertEqual(hash(make_hashable(value)), hash(make_hashable(dict(value))))
 
+    def test_cached_classproperty(self):
+        class A(object):
+            calls = []
+            items = [1]
 
+            @cached_classproperty('items')
+            def total(cls):
+                cls.calls.append(cls)
+                return sum(cls.items)
 
+        class B(A):
+            pass
+
+        self.assertEqual(A.total, 1)
+        self.assertEqual(A().total, 1)
+        self.assertEqual(A.calls, [A])
+
+        self.assertEqual(B.total, 1)
+        B.items = [1, 2]
+        self.assertEqual(B.total, 3)
+        self.assertEqual(A.total, 1)
+        self.assertEqual(A.calls, [A, B, B])
+
+    @skipIf(asyncio is None, 'asyncio is not available')
+    def test_then(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        future = then(as_future(2, loop=loop), lambda value: value * 2, loop=loop)
+        self.assertEqual(loop.run_until_complete(future), 4)
+
+        chained = then(future, lambda value: as_future(value + 1, loop=loop), loop=loop)
+        self.assertEqual(loop.run_until_complete(chained), 5)
+
+        failed = then(future, lambda value: 1 / 0, loop=loop)
+        self.assertRaises(ZeroDivisionError, loop.run_until_complete, failed)
+
+        recovered = then(failed, lambda value: value, loop=loop,
+                         errback=lambda e: type(e).__name__)
+        self.assertEqual(loop.run_until_complete(recovered), 'ZeroDivisionError')
@@ -1,10 +1,43 @@
 # coding: utf-8
 from __future__ import unicode_literals
 
+import copy
+import unicodedata
+import weakref
+
 import six
-from django.core.exceptions import ObjectDoesNotExist
+
+try:
+    from collections import OrderedDict
+except ImportError:  # Python 2.6, Django < 1.7
+    from django.utils.datastructures import SortedDict as OrderedDict  # NOQA
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+try:
+    import asyncio
+except ImportError:  # Python 2
+    asyncio = None
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import connection, connections, router
+from django.db.transaction import atomic
 from django.db.models import ForeignKey
+from django.forms.formsets import INITIAL_FORM_COUNT, TOTAL_FORM_COUNT
+from django.forms.models import ModelChoiceField, ModelChoiceIterator, ModelMultipleChoiceField
 from django.template import Variable, VariableDoesNotExist
+from django.forms.widgets import Widget
+from django.utils.datastructures import MultiValueDict
+from django.utils.encoding import force_text
+from django.utils.functional import Promise
+
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:  # Django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
 
 
 class ClassPropertyDescriptor(object):
@@ -30,6 +63,40 @@ class ClassPropertyDescriptor(object):
         return self
 
 
+class CachedClassPropertyDescriptor(ClassPropertyDescriptor):
+    """
+    A class property computed once per class. The value is recomputed when
+    one of the class attributes named in ``depends_on`` is reassigned.
+    """
+
+    def __init__(self, fget, fset=None, depends_on=()):
+        super(CachedClassPropertyDescriptor, self).__init__(fget, fset)
+        self.depends_on = tuple(depends_on)
+        self.cache = weakref.WeakKeyDictionary()
+
+    def __get__(self, obj, klass=None):
+        if klass is None:
+            klass = type(obj)
+        dependencies = tuple(getattr(klass, name, None) for name in self.depends_on)
+        try:
+            cached_dependencies, value = self.cache[klass]
+        except KeyError:
+            pass
+        else:
+            if all(a is b for a, b in zip(cached_dependencies, dependencies)):
+                return value
+
+        value = super(CachedClassPropertyDescriptor, self).__get__(obj, klass)
+        self.cache[klass] = (dependencies, value)
+        return value
+
+    def cache_clear(self, klass=None):
+        if klass is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(klass, None)
+
+
 def classproperty(func):
     if not isinstance(func, (classmethod, staticmethod)):
         func = classmethod(func)
@@ -37,6 +104,15 @@ def classproperty(func):
     return ClassPropertyDescriptor(func)
 
 
+def cached_classproperty(*depends_on):
+    def decorator(func):
+        if not isinstance(func, (classmethod, staticmethod)):
+            func = classmethod(func)
+
+        return CachedClassPropertyDescriptor(func, depends_on=depends_on)
+    return decorator
+
+
 _unset = object()
 
 
@@ -84,18 +160,722 @@ def setattr_path(obj, path, value):
     setattr(sub_obj, parts[-1], value)
 
 
-def depth_save_relations(obj):
-    for field, _ in obj._meta.get_fields_with_model():
-        if not isinstance(field, ForeignKey):
+def make_hashable(value):
+    """
+    Converts nested dicts, lists and tuples into tuples so ``value`` can be
+    used as (a part of) a dictionary key.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, make_hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(make_hashable(v) for v in value)
+    return value
+
+
+def get_cached_relation(obj, field):
+    """
+    Returns the object cached for the ForeignKey ``field`` of ``obj`` or
+    ``None``, without querying the database.
+    """
+    if hasattr(field, 'is_cached'):  # Django >= 2.0
+        return field.get_cached_value(obj) if field.is_cached(obj) else None
+    return getattr(obj, field.get_cache_name(), None)
+
+
+def can_bulk_create(model, objs):
+    """
+    Whether ``objs`` can be inserted with ``bulk_create`` and still end up
+    with their primary keys set.
+    """
+    if model._meta.parents:
+        # bulk_create doesn't support multi-table inheritance
+        return False
+    if all(obj.pk is not None for obj in objs):
+        return True
+    features = connections[router.db_for_write(model)].features
+    return (getattr(features, 'can_return_ids_from_bulk_insert', False) or
+            getattr(features, 'can_return_rows_from_bulk_insert', False))
+
+
+class nullcontext(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class SavePlan(object):
+    """
+    Saves a graph of model objects batch by batch.
+
+    The objects added to the plan and every unsaved object they reach through
+    their ForeignKeys are ordered by dependency: an object is saved in a batch
+    after the objects it points to, and their primary keys are copied to its
+    ForeignKeys right before. A batch holds the objects of one model at the
+    same depth of the graph.
+
+    With ``bulk=True`` the new objects of a batch are inserted with one
+    ``bulk_create`` when :func:`can_bulk_create` allows it, the existing ones
+    are updated with ``bulk_update`` when available and the deleted objects
+    are removed with one query per model. Like the bulk methods of the ORM,
+    this skips ``Model.save``, ``Model.delete`` and their signals. Otherwise
+    every object is saved with ``save()``, just in a better order.
+
+    With ``savepoints=True`` every batch runs in its own savepoint.
+    """
+
+    def __init__(self, bulk=False, savepoints=False):
+        self.bulk = bulk
+        self.savepoints = savepoints
+        self.objects = OrderedDict()
+        self.deleted = []
+
+    def add(self, obj, update_fields=None):
+        """
+        Adds ``obj`` to the plan. ``update_fields`` limits the columns written
+        when ``obj`` already exists, an empty list skips saving it.
+        """
+        self.objects[id(obj)] = (obj, update_fields)
+        return self
+
+    def delete(self, obj):
+        """
+        Deletes ``obj`` before anything is saved.
+        """
+        if obj.pk is not None:
+            self.deleted.append(obj)
+        return self
+
+    def get_relations(self, obj):
+        for field in obj._meta.concrete_fields:
+            if isinstance(field, ForeignKey):
+                rel_obj = get_cached_relation(obj, field)
+                if rel_obj is not None:
+                    yield field, rel_obj
+
+    def get_batches(self):
+        """
+        Returns a list of ``(model, objects)`` two-tuples in the order they
+        have to be saved.
+        """
+        depths = OrderedDict()
+
+        def visit(obj, path):
+            key = id(obj)
+            if key in depths:
+                return depths[key][0]
+            if key in path:
+                raise ValueError(
+                    "Can't save %r, it's part of a cycle of unsaved objects." % obj
+                )
+            path.add(key)
+            depth = 0
+            for field, rel_obj in self.get_relations(obj):
+                if rel_obj.pk is None:
+                    depth = max(depth, visit(rel_obj, path) + 1)
+            path.discard(key)
+            depths[key] = (depth, obj)
+            return depth
+
+        for obj, update_fields in self.objects.values():
+            visit(obj, set())
+
+        batches = OrderedDict()
+        for depth, obj in depths.values():
+            batches.setdefault((depth, type(obj)), []).append(obj)
+        return [(model, objs) for (depth, model), objs
+                in sorted(batches.items(), key=lambda item: item[0][0])]
+
+    def execute(self):
+        deleted = OrderedDict()
+        for obj in self.deleted:
+            deleted.setdefault(type(obj), []).append(obj)
+        for model, objs in deleted.items():
+            with self.batch_atomic(model):
+                if self.bulk:
+                    model._base_manager.filter(pk__in=[obj.pk for obj in objs]).delete()
+                else:
+                    for obj in objs:
+                        obj.delete()
+
+        for model, objs in self.get_batches():
+            with self.batch_atomic(model):
+                self.save_batch(model, objs)
+
+    def batch_atomic(self, model):
+        if self.savepoints:
+            return atomic(using=router.db_for_write(model))
+        return nullcontext()
+
+    def save_batch(self, model, objs):
+        created = []
+        updated = OrderedDict()
+        for obj in objs:
+            update_fields = self.objects.get(id(obj), (obj, None))[1]
+            filled = self.fill_relations(obj)
+            if obj._state.adding:
+                created.append(obj)
+                continue
+            if update_fields is not None:
+                update_fields = tuple(update_fields) + tuple(f for f in filled if f not in update_fields)
+                if not update_fields:
+                    continue
+            updated.setdefault(update_fields, []).append(obj)
+
+        for update_fields, update_objs in updated.items():
+            if self.bulk and update_fields and hasattr(model._base_manager, 'bulk_update'):
+                model._base_manager.bulk_update(update_objs, update_fields)
+            else:
+                for obj in update_objs:
+                    obj.save(update_fields=update_fields)
+
+        if self.bulk and created and can_bulk_create(model, created):
+            db = router.db_for_write(model)
+            model._base_manager.using(db).bulk_create(created)
+            for obj in created:
+                obj._state.adding = False
+                obj._state.db = db
+        else:
+            for obj in created:
+                obj.save()
+
+    def fill_relations(self, obj):
+        """
+        Copies the primary keys of the saved related objects to the
+        ForeignKeys of ``obj``, returns the names of the updated fields.
+        """
+        filled = []
+        for field, rel_obj in self.get_relations(obj):
+            if rel_obj.pk is not None and getattr(obj, field.attname) is None:
+                setattr(obj, field.name, rel_obj)
+                filled.append(field.name)
+        return filled
+
+
+def _get_unique_lookup(instance, unique_check):
+    """
+    Returns the values of ``instance`` for the fields of ``unique_check``, or
+    ``None`` when ``Model._perform_unique_checks`` would skip the check.
+    """
+    lookup = []
+    for field_name in unique_check:
+        field = instance._meta.get_field(field_name)
+        value = getattr(instance, field.attname)
+        if value is None or (value == '' and connection.features.interprets_empty_strings_as_nulls):
+            return None
+        if field.primary_key and not instance._state.adding:
+            return None
+        lookup.append(value)
+    return tuple(lookup)
+
+
+def validate_unique_forms(forms, chunk_size=500):
+    """
+    Does what ``ModelForm.validate_unique`` does for each of the model forms
+    ``forms``, but runs each unique check with one query for all the forms
+    (per ``chunk_size`` forms) instead of one query per form. The date checks
+    still run form by form.
+    """
+    form_errors = OrderedDict((form, {}) for form in forms)
+    date_errors = {}
+    checks = OrderedDict()
+    for form in forms:
+        instance = form.instance
+        unique_checks, date_checks = instance._get_unique_checks(exclude=form._get_validation_exclusions())
+        date_errors[form] = instance._perform_date_checks(date_checks)
+        for model_class, unique_check in unique_checks:
+            lookup = _get_unique_lookup(instance, unique_check)
+            if lookup is not None:
+                checks.setdefault((model_class, tuple(unique_check)), []).append((form, lookup))
+
+    for (model_class, unique_check), entries in checks.items():
+        for start in range(0, len(entries), chunk_size):
+            chunk = entries[start:start + chunk_size]
+            conflicts = _find_unique_conflicts(model_class, unique_check, chunk)
+            for (form, lookup), conflict in zip(chunk, conflicts):
+                if conflict:
+                    key = unique_check[0] if len(unique_check) == 1 else NON_FIELD_ERRORS
+                    form_errors[form].setdefault(key, []).append(
+                        form.instance.unique_error_message(model_class, unique_check))
+
+    for form, errors in form_errors.items():
+        for key, messages in date_errors[form].items():
+            errors.setdefault(key, []).extend(messages)
+        if errors:
+            form._update_errors(ValidationError(errors))
+
+
+def _fold_lookup(lookup):
+    """
+    Returns the values of ``lookup`` as a lenient collation compares them:
+    strings without case, accents and trailing spaces.
+    """
+    folded = []
+    for value in lookup:
+        if isinstance(value, six.string_types):
+            value = unicodedata.normalize('NFKD', force_text(value))
+            value = ''.join(c for c in value if not unicodedata.combining(c)).lower().rstrip()
+        folded.append(value)
+    return tuple(folded)
+
+
+def _find_unique_conflicts(model_class, unique_check, entries):
+    """
+    Returns whether another row of ``model_class`` has the values of each
+    ``(form, lookup)`` entry for the fields of ``unique_check``.
+    """
+    candidates = [set() for field_name in unique_check]
+    folded = {}
+    for form, lookup in entries:
+        for values, value in zip(candidates, lookup):
+            values.add(value)
+        folded.setdefault(_fold_lookup(lookup), set()).add(lookup)
+
+    filters = dict(('%s__in' % field_name, values) for field_name, values in zip(unique_check, candidates))
+    found = {}
+    for row in model_class._default_manager.filter(**filters).values_list('pk', *unique_check):
+        lookup = tuple(row[1:])
+        if (any(value not in values for value, values in zip(lookup, candidates)) or
+                folded.get(_fold_lookup(lookup), set()).difference([lookup])):
+            # The database may compare differently (e.g. case insensitive)
+            # and match the row to another entry, the rows can't be told
+            # apart here, ask the database for each one.
+            return [_has_unique_conflict(form.instance, model_class, unique_check) for form, lookup in entries]
+        found.setdefault(lookup, set()).add(row[0])
+
+    conflicts = []
+    for form, lookup in entries:
+        pks = set(found.get(lookup, ()))
+        instance = form.instance
+        if not instance._state.adding:
+            pks.discard(instance._get_pk_val(model_class._meta))
+        conflicts.append(bool(pks))
+    return conflicts
+
+
+def _has_unique_conflict(instance, model_class, unique_check):
+    return bool(instance._perform_unique_checks([(model_class, unique_check)]))
+
+
+def queryset_signature(queryset):
+    """
+    Returns a hashable value identifying the rows ``queryset`` selects, or
+    ``None`` when it can't be told (sliced querysets, unhashable parameters).
+    """
+    query = queryset.query
+    if not query.can_filter():
+        return None
+    try:
+        sql, params = query.sql_with_params()
+    except EmptyResultSet:
+        sql, params = None, ()
+    try:
+        hash(params)
+    except TypeError:
+        return None
+    return (queryset.model, queryset.db, sql, params)
+
+
+def prefetch_model_choices(forms):
+    """
+    Loads the objects chosen in the ModelChoiceFields and
+    ModelMultipleChoiceFields of the bound ``forms`` with one query per
+    distinct queryset, and makes the fields resolve the submitted values from
+    them instead of querying once per form. Values that aren't found fall back
+    to the regular lookup, so the validation errors stay the same.
+
+    Returns the patched fields, pass them to :func:`clear_model_choices` once
+    the forms are cleaned.
+    """
+    groups = OrderedDict()
+    for form in forms:
+        if not form.is_bound:
             continue
+        for name, field in form.fields.items():
+            if not isinstance(field, ModelChoiceField):
+                continue
+            signature = queryset_signature(field.queryset)
+            if signature is None:
+                continue
+            key = field.to_field_name or 'pk'
+            value = field.widget.value_from_datadict(form.data, form.files, form.add_prefix(name))
+            if isinstance(field, ModelMultipleChoiceField):
+                if not isinstance(value, (list, tuple)):
+                    continue
+                values = value
+            else:
+                values = [value]
+
+            group_fields, group_values = groups.setdefault((signature, key), ([], set()))
+            group_fields.append(field)
+            for value in values:
+                if value in field.empty_values:
+                    continue
+                try:
+                    # Invalid values are left for the regular lookup to reject
+                    field.queryset.filter(**{key: value})
+                    group_values.add(value)
+                except (ValueError, TypeError):
+                    pass
+
+    patched = []
+    for (signature, key), (group_fields, values) in groups.items():
+        queryset = group_fields[0].queryset
+        if not values:
+            chosen = {}
+        elif key == 'pk':
+            chosen = dict((force_text(pk), obj) for pk, obj in queryset.in_bulk(list(values)).items())
+        else:
+            chosen = dict((force_text(getattr(obj, key)), obj)
+                          for obj in queryset.filter(**{'%s__in' % key: list(values)}))
+        for field in group_fields:
+            if isinstance(field, ModelMultipleChoiceField):
+                field._check_values = _cached_check_values(field, key, chosen)
+            else:
+                field.to_python = _cached_to_python(field, chosen)
+            patched.append(field)
+    return patched
 
-        f_name = field.name
+
+def _cached_to_python(field, chosen):
+    to_python = field.to_python
+
+    def cached_to_python(value):
+        if value in field.empty_values:
+            return None
         try:
-            rel_obj = getattr(obj, f_name)
-            if rel_obj and not rel_obj.pk:
-                depth_save_relations(rel_obj)
-                setattr(obj, f_name, rel_obj)
-        except ObjectDoesNotExist:
-            pass
+            return chosen[force_text(value)]
+        except KeyError:
+            return to_python(value)
+    return cached_to_python
+
+
+def _cached_check_values(field, key, chosen):
+    check_values = field._check_values
+
+    def cached_check_values(value):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            return check_values(value)
+        if all(force_text(v) in chosen for v in value):
+            return field.queryset.filter(**{'%s__in' % key: value})
+        return check_values(value)
+    return cached_check_values
+
+
+def clear_model_choices(fields):
+    """
+    Restores the fields patched by :func:`prefetch_model_choices`.
+    """
+    for field in fields:
+        field.__dict__.pop('to_python', None)
+        field.__dict__.pop('_check_values', None)
+
+
+class SharedChoices(object):
+    """
+    The choices of a ModelChoiceField, evaluated on first use and then shared
+    by all the fields it is assigned to.
+    """
+
+    def __init__(self, field):
+        self.iterator = ModelChoiceIterator(field)
+        self.choices = None
+
+    def __iter__(self):
+        if self.choices is None:
+            # iter() keeps list() from asking the iterator for its length,
+            # which evaluates the queryset a second time
+            self.choices = list(iter(self.iterator))
+        return iter(self.choices)
+
+    def __len__(self):
+        return len(list(self))
+
+
+def share_model_choices(form, cache):
+    """
+    Makes the ModelChoiceFields of ``form`` use the choices stored in the dict
+    ``cache`` for the same queryset, so that forms sharing ``cache`` evaluate
+    each distinct queryset once when rendered. Only the widgets share the
+    choices: assigning a new ``queryset`` to a field gives its widget fresh
+    choices again.
+    """
+    for field in form.fields.values():
+        if not isinstance(field, ModelChoiceField):
+            continue
+        signature = queryset_signature(field.queryset)
+        if signature is None:
+            continue
+        to_field_name = field.to_field_name or field.queryset.model._meta.pk.name
+        # a label_from_instance set on the field renders other choices
+        label_from_instance = field.__dict__.get('label_from_instance')
+        key = (signature, type(field), field.empty_label, to_field_name, label_from_instance)
+        choices = cache.get(key)
+        if choices is None:
+            choices = cache[key] = SharedChoices(field)
+        field.widget.choices = choices
+
+
+#: Attribute values the copy-on-write fields share with their prototype
+#: instead of copying them.
+SHARED_ATTRIBUTE_TYPES = six.string_types + six.integer_types + (float, type(None), Promise)
+
+
+class PrototypeAttribute(object):
+    """
+    An attribute of a copy-on-write field that hasn't been set yet. Strings,
+    numbers and ``None`` are read from the prototype, other values are copied
+    into the field on first read.
+    """
+
+    def __init__(self, name, default):
+        self.name = name
+        self.default = default
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.default
+        prototype = instance._prototype
+        value = prototype.__dict__[self.name]
+        if isinstance(value, SHARED_ATTRIBUTE_TYPES):
+            return value
+        # references to the prototype point to the field in the copy
+        value = copy.deepcopy(value, {id(prototype): instance})
+        choices = getattr(value, 'choices', None)
+        if isinstance(value, Widget) and isinstance(choices, ModelChoiceIterator):
+            # the widget of a ModelChoiceField iterates over its field
+            value.choices = ModelChoiceIterator(instance)
+        instance.__dict__[self.name] = value
+        return value
+
+
+_copy_on_write_classes = {}
+
+
+def get_copy_on_write_class(prototype):
+    """
+    Returns a subclass of the class of the field ``prototype`` whose instances
+    copy the attributes of the prototype lazily, see ``PrototypeFields``.
+    """
+    field_class = type(prototype)
+    names = frozenset(
+        name for name in vars(prototype)
+        # the data descriptors of the class take precedence anyway
+        if not hasattr(getattr(field_class, name, None), '__set__')
+    )
+    key = (field_class, names)
+    cow_class = _copy_on_write_classes.get(key)
+    if cow_class is None:
+        attrs = dict(
+            (name, PrototypeAttribute(name, getattr(field_class, name, None))) for name in names
+        )
+        attrs[str('__module__')] = field_class.__module__
+        cow_class = _copy_on_write_classes.setdefault(key, type(field_class)(field_class.__name__, (field_class,), attrs))
+    return cow_class
+
+
+class PrototypeFields(OrderedDict):
+    """
+    Pristine copies of the ``base_fields`` of a form class. Deep copying it,
+    like ``BaseForm.__init__`` does, returns copy-on-write fields: each
+    attribute of a field is copied from the prototype when it is first read
+    or set, the untouched ones are never copied.
+    """
+
+    def __init__(self, fields):
+        super(PrototypeFields, self).__init__(
+            (name, copy.deepcopy(field)) for name, field in fields.items()
+        )
+        self.classes = dict(
+            (name, get_copy_on_write_class(field)) for name, field in self.items()
+        )
+
+    def __deepcopy__(self, memo):
+        fields = OrderedDict()
+        for name, prototype in self.items():
+            field = fields[name] = self.classes[name].__new__(self.classes[name])
+            field._prototype = prototype
+        return fields
+
+    def __reduce__(self):
+        return OrderedDict, (list(self.items()),)
+
+
+def partition_by_prefix(data, prefixes):
+    """
+    Splits ``data``, a dict or a MultiValueDict like ``request.POST``, into
+    one dict of the same kind per prefix in ``prefixes`` with a single pass
+    over the keys. A key goes to the longest prefix it starts with followed
+    by a dash, the keys of no prefix are left out.
+    """
+    if data is None:
+        return dict.fromkeys(prefixes)
+
+    multi = isinstance(data, MultiValueDict)
+    slices = dict((prefix, MultiValueDict() if multi else {}) for prefix in prefixes)
+    for key, value in (data.lists() if multi else data.items()):
+        end = len(key)
+        while end > 0:
+            end = key.rfind('-', 0, end)
+            part = slices.get(key[:end]) if end > 0 else None
+            if part is not None:
+                if multi:
+                    part.setlist(key, value)
+                else:
+                    part[key] = value
+                break
+    return slices
+
+
+class NestedData(Mapping):
+    """
+    Presents the nested data of a child form as flat form data: for the
+    prefix ``user``, ``user-name`` is read from ``data['name']``. Nothing is
+    copied, the keys are resolved when they are looked up.
+    """
+
+    def __init__(self, data, prefix):
+        self.data = data
+        self.prefix = prefix
+
+    def _get_name(self, key):
+        if self.prefix is None:
+            return key
+        start = '%s-' % self.prefix
+        if not key.startswith(start):
+            raise KeyError(key)
+        return key[len(start):]
+
+    def _add_prefix(self, name):
+        return name if self.prefix is None else '%s-%s' % (self.prefix, name)
+
+    def __getitem__(self, key):
+        return self.data[self._get_name(key)]
+
+    def __iter__(self):
+        return (self._add_prefix(name) for name in self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class NestedFormSetData(NestedData):
+    """
+    Presents a list of row dicts to a formset as flat form data:
+    ``images-0-name`` is read from ``rows[0]['name']``, the management data
+    is taken from the number of rows and ``initial_forms``.
+    """
+
+    def __init__(self, rows, prefix, initial_forms=0):
+        super(NestedFormSetData, self).__init__(rows, prefix)
+        self.management = {
+            TOTAL_FORM_COUNT: len(rows),
+            INITIAL_FORM_COUNT: min(initial_forms, len(rows)),
+        }
+
+    def __getitem__(self, key):
+        name = self._get_name(key)
+        if name in self.management:
+            return self.management[name]
+        index, _, name = name.partition('-')
+        try:
+            row = self.data[int(index)]
+        except (ValueError, IndexError):
+            raise KeyError(key)
+        if not isinstance(row, Mapping) or name not in row:
+            raise KeyError(key)
+        return row[name]
+
+    def __iter__(self):
+        for name in self.management:
+            yield self._add_prefix(name)
+        for index, row in enumerate(self.data):
+            if isinstance(row, Mapping):
+                for name in row:
+                    yield self._add_prefix('%s-%s' % (index, name))
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+
+def depth_save_relations(obj):
+    """
+    Saves ``obj`` after the unsaved objects it points to with a ForeignKey.
+    """
+    SavePlan().add(obj).execute()
+
+
+def is_awaitable(value):
+    if asyncio is None:
+        return False
+    return asyncio.iscoroutine(value) or isinstance(value, asyncio.Future) or hasattr(value, '__await__')
+
+
+def is_async_callable(func):
+    return asyncio is not None and asyncio.iscoroutinefunction(func)
+
+
+def as_future(value, loop=None):
+    """
+    Wraps ``value`` into an asyncio Future. Awaitables are scheduled, any
+    other value becomes the result of an already finished future.
+    """
+    loop = loop or asyncio.get_event_loop()
+    if is_awaitable(value):
+        return asyncio.ensure_future(value, loop=loop)
+    future = asyncio.Future(loop=loop)
+    future.set_result(value)
+    return future
+
+
+def then(future, callback, loop=None, errback=None):
+    """
+    Returns a future resolved with ``callback(future.result())`` once
+    ``future`` is done. When ``future`` fails, ``errback(exception)`` is used
+    instead, or the exception is propagated. If the callback returns an
+    awaitable, the returned future follows it.
+
+    This allows writing coroutines without the ``async``/``await`` syntax,
+    which Python 2 can't parse.
+    """
+    loop = loop or asyncio.get_event_loop()
+    outer = asyncio.Future(loop=loop)
+
+    def copy_state(inner):
+        if outer.cancelled():
+            return
+        if inner.cancelled():
+            outer.cancel()
+        elif inner.exception() is not None:
+            outer.set_exception(inner.exception())
+        else:
+            outer.set_result(inner.result())
+
+    def on_done(inner):
+        if outer.cancelled():
+            return
+        if inner.cancelled():
+            outer.cancel()
+            return
+        exception = inner.exception()
+        if exception is not None and errback is None:
+            outer.set_exception(exception)
+            return
+        try:
+            if exception is None:
+                result = callback(inner.result())
+            else:
+                result = errback(exception)
+        except Exception as e:
+            outer.set_exception(e)
+            return
+        if is_awaitable(result):
+            as_future(result, loop).add_done_callback(copy_state)
+        else:
+            outer.set_result(result)
 
-    obj.save()
+    as_future(future, loop).add_done_callback(on_done)
+    return outer
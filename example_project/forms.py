@@ -8,7 +8,7 @@ from django.core.exceptions import ValidationError
 
 from betterforms.multiform import MultiFormMixin, MultiModelFormMixin, MultiModelForm
 
-from .models import User, Profile, Badge, Author, Book, BookImage
+from .models import User, Profile, Badge, Author, Book, BookImage, Chapter
 
 
 class UserForm(forms.ModelForm):
@@ -50,6 +50,25 @@ class ErrorMultiForm(MultiFormMixin):
     }
 
 
+class ParallelErrorMultiForm(ErrorMultiForm):
+    parallel_validation = True
+
+
+class DateTimeForm(forms.Form):
+    date = forms.DateTimeField()
+
+
+class DateTimeMultiForm(MultiFormMixin):
+    form_classes = OrderedDict((
+        ('first', DateTimeForm),
+        ('second', DateTimeForm),
+    ))
+
+
+class ParallelDateTimeMultiForm(DateTimeMultiForm):
+    parallel_validation = True
+
+
 class FileForm(forms.Form):
     # we use this widget to test the media property
     date = forms.DateTimeField(widget=admin_widgets.AdminSplitDateTime)
@@ -64,6 +83,10 @@ class NeedsFileField(MultiFormMixin):
     ))
 
 
+class PartitionedNeedsFileField(NeedsFileField):
+    partition_data = True
+
+
 class BadgeForm(forms.ModelForm):
     class Meta:
         model = Badge
@@ -77,6 +100,19 @@ class BadgeMultiForm(MultiModelFormMixin):
     }
 
 
+class UserMetaMultiForm(MultiModelFormMixin):
+    default_form_key = 'user'
+    form_classes = OrderedDict((
+        ('user', UserForm),
+        ('badge', BadgeForm),
+    ))
+
+    class Meta(MultiModelFormMixin.Meta):
+        model = User
+        fields = ('name',)
+        widgets = {'name': forms.Textarea}
+
+
 class NonModelForm(forms.Form):
     field1 = forms.CharField()
 
@@ -147,6 +183,127 @@ class BookMultiForm(MultiModelFormMixin):
         super(BookMultiForm, self).__init__(*args, **kwargs)
 
 
+class BookImagesMultiForm(MultiModelFormMixin):
+    default_form_key = 'book'
+    form_classes = OrderedDict((
+        ('book', BookForm),
+        ('images', BookImageFormSet),
+    ))
+
+
+class BulkBookImagesMultiForm(BookImagesMultiForm):
+    bulk_save = True
+
+
+class ChangedFieldsBookImagesMultiForm(BookImagesMultiForm):
+    full_row_save = False
+
+
+class NonAtomicBookImagesMultiForm(BookImagesMultiForm):
+    atomic_save = False
+
+
+class SavepointBookImagesMultiForm(BookImagesMultiForm):
+    save_savepoints = True
+
+
+class NestedBookImagesMultiForm(BookImagesMultiForm):
+    nested_data = True
+
+
+class ReversedImagesMultiForm(BookImagesMultiForm):
+    def clean(self):
+        cleaned_data = super(ReversedImagesMultiForm, self).clean()
+        cleaned_data['images'] = [
+            dict(row, name=row['name'].upper()) for row in reversed(cleaned_data['images'])
+        ]
+        return cleaned_data
+
+
+class BookChaptersMultiForm(MultiModelFormMixin):
+    default_form_key = 'book'
+    form_classes = OrderedDict((
+        ('book', BookForm),
+        ('chapters', inlineformset_factory(Book, Chapter, fields=('title', 'number'))),
+    ))
+
+
+class BatchedBookChaptersMultiForm(BookChaptersMultiForm):
+    batch_unique_validation = True
+
+
+class BookChoiceForm(forms.Form):
+    book = forms.ModelChoiceField(Book.objects.all())
+    books = forms.ModelMultipleChoiceField(Book.objects.all(), required=False)
+
+
+class ImageBooksMultiForm(MultiFormMixin):
+    form_classes = OrderedDict((
+        ('images', modelformset_factory(BookImage, fields=('book', 'name'), extra=0)),
+        ('choices', formset_factory(BookChoiceForm, extra=0)),
+    ))
+
+
+class BatchedImageBooksMultiForm(ImageBooksMultiForm):
+    batch_choice_resolution = True
+
+
+class SharedChoicesImageBooksMultiForm(ImageBooksMultiForm):
+    share_choices = True
+
+
+def labeled_book(book):
+    return 'Labeled %s' % book.name
+
+
+class LabeledBookChoiceForm(BookChoiceForm):
+    def __init__(self, *args, **kwargs):
+        super(LabeledBookChoiceForm, self).__init__(*args, **kwargs)
+        self.fields['book'].label_from_instance = labeled_book
+
+
+class LabeledImageBooksMultiForm(ImageBooksMultiForm):
+    form_classes = OrderedDict((
+        ('images', ImageBooksMultiForm.form_classes['images']),
+        ('choices', formset_factory(LabeledBookChoiceForm, extra=0)),
+    ))
+
+
+class SharedChoicesLabeledImageBooksMultiForm(LabeledImageBooksMultiForm):
+    share_choices = True
+
+
+class PartitionedImageBooksMultiForm(ImageBooksMultiForm):
+    partition_data = True
+
+
+class LimitedImageBooksMultiForm(ImageBooksMultiForm):
+    max_formset_rows = {'choices': 3}
+    max_total_formset_rows = 5
+
+
+class WideForm(forms.Form):
+    def __init__(self, *args, **kwargs):
+        super(WideForm, self).__init__(*args, **kwargs)
+        self.fields['field0'].help_text = 'changed in __init__'
+
+WideForm.base_fields.update(
+    ('field%s' % i, forms.ChoiceField(choices=[(j, 'choice %s' % j) for j in range(10)]))
+    for i in range(150)
+)
+
+
+class WideMultiForm(MultiFormMixin):
+    form_classes = OrderedDict((
+        ('wide', WideForm),
+        ('choices', formset_factory(BookChoiceForm, extra=2)),
+    ))
+
+
+class PrototypeWideMultiForm(WideMultiForm):
+    prototype_fields = True
+
+
 class RaisesErrorCustomCleanMultiform(UserProfileMultiForm):
     def clean(self):
         cleaned_data = super(UserProfileMultiForm, self).clean()
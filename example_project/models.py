@@ -29,3 +29,12 @@ class Book(models.Model):
 class BookImage(models.Model):
     book = models.ForeignKey(Book, related_name='images')
     name = models.CharField(max_length=255)
+
+
+class Chapter(models.Model):
+    book = models.ForeignKey(Book, related_name='chapters')
+    title = models.CharField(max_length=255, unique=True)
+    number = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('book', 'number')
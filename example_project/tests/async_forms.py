@@ -0,0 +1,78 @@
+# Python 3.5+ only, imported conditionally by the tests.
+import asyncio
+from collections import OrderedDict
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.forms import formset_factory
+
+from betterforms.multiform import MultiFormMixin
+
+
+async def reject_foo(value):
+    await asyncio.sleep(0)
+    if value == 'foo':
+        raise ValidationError('No foo')
+
+
+class AsyncValidatorForm(forms.Form):
+    name = forms.CharField(validators=[reject_foo])
+
+
+class AsyncCleanForm(forms.Form):
+    name = forms.CharField()
+
+    async def clean(self):
+        await asyncio.sleep(0)
+        cleaned_data = dict(self.cleaned_data)
+        cleaned_data['name'] = cleaned_data['name'].upper()
+        return cleaned_data
+
+
+class AsyncMultiForm(MultiFormMixin):
+    form_classes = OrderedDict((
+        ('validated', AsyncValidatorForm),
+        ('cleaned', AsyncCleanForm),
+        ('rows', formset_factory(AsyncValidatorForm)),
+    ))
+
+    async def clean(self):
+        await asyncio.sleep(0)
+        cleaned_data = self.cleaned_data
+        if cleaned_data.get('validated', {}).get('name') == 'broken':
+            raise ValidationError('It broke')
+
+
+class OrderedValidationForm(forms.Form):
+    name = forms.CharField(validators=[reject_foo])
+
+    def clean_name(self):
+        self.calls.append('clean_name')
+        return self.cleaned_data['name']
+
+    def clean(self):
+        self.calls.append(('clean', sorted(self.cleaned_data)))
+        return self.cleaned_data
+
+
+class OrderedValidationMultiForm(MultiFormMixin):
+    form_classes = {
+        'ordered': OrderedValidationForm,
+    }
+
+    def get_forms(self, *args, **kwargs):
+        forms = super(OrderedValidationMultiForm, self).get_forms(*args, **kwargs)
+        forms['ordered'].calls = []
+        return forms
+
+
+def run(func, *args):
+    loop = asyncio.new_event_loop()
+
+    async def main():
+        return await func(*args)
+
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
@@ -3,22 +3,617 @@ from __future__ import unicode_literals
 
 from collections import OrderedDict
 
+import mock
+
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import DatabaseError, connection
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.views.generic import CreateView
 from django.core import urlresolvers
 from django.utils.encoding import force_text
 
-from ..models import User, Profile, Badge, Book
+from betterforms.utils import SavePlan
+
+from ..models import User, Profile, Badge, Book, BookImage, Chapter
 
 from ..forms import (
     UserProfileMultiForm, BadgeMultiForm, ErrorMultiForm,
     MixedForm, NeedsFileField, ManyToManyMultiForm, Step2Form,
     BookMultiForm, RaisesErrorCustomCleanMultiform,
-    ModifiesDataCustomCleanMultiform,
+    ModifiesDataCustomCleanMultiform, BookImagesMultiForm, BulkBookImagesMultiForm,
+    ChangedFieldsBookImagesMultiForm, NonAtomicBookImagesMultiForm, SavepointBookImagesMultiForm,
+    ReversedImagesMultiForm, BookChaptersMultiForm, BatchedBookChaptersMultiForm,
+    ImageBooksMultiForm, BatchedImageBooksMultiForm, SharedChoicesImageBooksMultiForm,
+    LabeledImageBooksMultiForm, SharedChoicesLabeledImageBooksMultiForm,
+    LimitedImageBooksMultiForm, BookChoiceForm, NestedBookImagesMultiForm,
 )
 
 from .utils import TestCase
 
 
+def writes(queries):
+    return [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+
+
 class ModelTestTest(TestCase):
     pass
+
+
+class SavePlanTest(TestCase):
+    def test_batches(self):
+        book = Book(name='Book')
+        images = [BookImage(book=book, name=name) for name in ('a', 'b')]
+        plan = SavePlan()
+        for image in images:
+            plan.add(image)
+        self.assertEqual(plan.get_batches(), [(Book, [book]), (BookImage, images)])
+
+        plan.execute()
+        self.assertEqual(Book.objects.get(), book)
+        self.assertEqual([image.book_id for image in images], [book.pk, book.pk])
+
+    def test_update_fields(self):
+        book = Book.objects.create(name='Book')
+        image = BookImage.objects.create(book=book, name='a')
+        BookImage.objects.filter(pk=image.pk).update(name='changed meanwhile')
+
+        image.name = 'b'
+        with self.assertNumQueries(0):
+            SavePlan().add(image, update_fields=[]).execute()
+        book.name = 'New name'
+        SavePlan().add(book, update_fields=['name']).add(image, update_fields=['book']).execute()
+        self.assertEqual(BookImage.objects.get().name, 'changed meanwhile')
+        self.assertEqual(Book.objects.get().name, 'New name')
+
+    def test_save_multiform(self):
+        form = BookImagesMultiForm({
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '2',
+            'images-INITIAL_FORMS': '0',
+            'images-MAX_NUM_FORMS': '1000',
+            'images-0-name': 'a',
+            'images-1-name': 'b',
+        }, instance={'book': Book()})
+        self.assertTrue(form.is_valid(), form.errors)
+        # one insert per object instead of saving the book for every image
+        with CaptureQueriesContext(connection) as queries:
+            book = form.save()
+        self.assertEqual(len(writes(queries)), 3)
+        self.assertEqual(sorted(book.images.values_list('name', flat=True)), ['a', 'b'])
+
+
+class BulkSaveTest(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(name='Book')
+        self.images = [BookImage.objects.create(book=self.book, name=name)
+                       for name in ('a', 'b', 'c')]
+
+    def get_data(self):
+        data = {
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '5',
+            'images-INITIAL_FORMS': '3',
+            'images-MAX_NUM_FORMS': '1000',
+            'images-0-name': 'a',
+            'images-1-name': 'b2',
+            'images-2-name': 'c',
+            'images-2-DELETE': 'on',
+            'images-3-name': 'd',
+            'images-4-name': 'e',
+        }
+        for i, image in enumerate(self.images):
+            data['images-%s-id' % i] = str(image.pk)
+            data['images-%s-book' % i] = str(self.book.pk)
+        return data
+
+    def save(self, form_class):
+        form = form_class(self.get_data(), instance={'book': self.book})
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as queries:
+            objects = form.save_multiform()
+        names = list(BookImage.objects.filter(book=self.book).order_by('pk').values_list('name', flat=True))
+        return objects, names, len(writes(queries))
+
+    def test_same_result_as_per_row_save(self):
+        objects, names, bulk_queries = self.save(BulkBookImagesMultiForm)
+        self.assertEqual(names, ['a', 'b2', 'd', 'e'])
+        self.assertTrue(all(image.pk for image in objects['images'] if not image.DO_DELETE))
+        self.assertEqual(BookImage.objects.get(name='d').book, self.book)
+
+        BookImage.objects.all().delete()
+        self.images = [BookImage.objects.create(book=self.book, name=name)
+                       for name in ('a', 'b', 'c')]
+        objects, names, queries = self.save(BookImagesMultiForm)
+        self.assertEqual(names, ['a', 'b2', 'd', 'e'])
+        self.assertLess(bulk_queries, queries)
+
+    def test_changed_fields_only(self):
+        form = BulkBookImagesMultiForm(self.get_data(), instance={'book': self.book})
+        self.assertTrue(form.is_valid(), form.errors)
+        images = form.cleaned_objects['images']
+        self.assertEqual([image.DO_CHANGED for image in images], [[], ['name'], [], ['name'], ['name']])
+
+        BookImage.objects.filter(pk=self.images[0].pk).update(name='changed meanwhile')
+        form.save_multiform()
+        self.assertEqual(BookImage.objects.get(pk=self.images[0].pk).name, 'changed meanwhile')
+
+
+class DirtyTrackingSaveTest(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(name='Book')
+        self.images = [BookImage.objects.create(book=self.book, name=name) for name in ('a', 'b')]
+        self.data = {
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '2',
+            'images-INITIAL_FORMS': '2',
+            'images-MAX_NUM_FORMS': '1000',
+            'images-0-name': 'a',
+            'images-1-name': 'b2',
+        }
+        for i, image in enumerate(self.images):
+            self.data['images-%s-id' % i] = str(image.pk)
+            self.data['images-%s-book' % i] = str(self.book.pk)
+
+    def save(self, form_class):
+        form = form_class(self.data, instance={'book': self.book})
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as queries:
+            form.save()
+        return writes(queries)
+
+    def test_changed_fields_only(self):
+        queries = self.save(ChangedFieldsBookImagesMultiForm)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('SET "name" = ', queries[0])
+        self.assertEqual(BookImage.objects.get(pk=self.images[1].pk).name, 'b2')
+
+    def test_full_row_save(self):
+        queries = self.save(BookImagesMultiForm)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(BookImage.objects.get(pk=self.images[1].pk).name, 'b2')
+
+
+class TransactionSaveTest(TestCase):
+    data = {
+        'book-name': 'Book',
+        'images-TOTAL_FORMS': '2',
+        'images-INITIAL_FORMS': '0',
+        'images-MAX_NUM_FORMS': '1000',
+        'images-0-name': 'a',
+        'images-1-name': 'b',
+    }
+
+    def save(self, form_class):
+        form = form_class(self.data, instance={'book': Book()})
+        self.assertTrue(form.is_valid(), form.errors)
+        with mock.patch.object(BookImage, 'save', side_effect=DatabaseError):
+            self.assertRaises(DatabaseError, form.save)
+
+    def test_all_or_nothing(self):
+        self.save(BookImagesMultiForm)
+        self.assertFalse(Book.objects.exists())
+
+    def test_no_atomic_save(self):
+        self.save(NonAtomicBookImagesMultiForm)
+        self.assertTrue(Book.objects.exists())
+
+    def test_savepoints(self):
+        form = SavepointBookImagesMultiForm(self.data, instance={'book': Book()})
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as queries:
+            form.save()
+        savepoints = [query for query in queries
+                      if 'SAVEPOINT' in query['sql'] and 'RELEASE' not in query['sql']]
+        # the transaction and one savepoint per batch
+        self.assertEqual(len(savepoints), 3)
+
+
+class CleanedDataOverrideTest(TestCase):
+    def test_rows_matched_by_instance(self):
+        book = Book.objects.create(name='Book')
+        images = [BookImage.objects.create(book=book, name=name) for name in ('a', 'b')]
+        data = {
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '3',
+            'images-INITIAL_FORMS': '2',
+            'images-MAX_NUM_FORMS': '1000',
+            'images-0-name': 'a',
+            'images-1-name': 'b',
+            'images-2-name': 'c',
+        }
+        for i, image in enumerate(images):
+            data['images-%s-id' % i] = str(image.pk)
+            data['images-%s-book' % i] = str(book.pk)
+        form = ReversedImagesMultiForm(data, instance={'book': book})
+        self.assertTrue(form.is_valid(), form.errors)
+
+        rows = form.forms['images'].forms
+        self.assertEqual([row.cleaned_data['id'] for row in rows[:2]], images)
+        self.assertEqual([row.cleaned_data['name'] for row in rows[:2]], ['A', 'B'])
+        # the new row has no instance, it gets the row without a primary key
+        self.assertEqual(rows[2].cleaned_data['name'], 'C')
+        self.assertIsNone(rows[2].cleaned_data['id'])
+
+    def test_dropped_row(self):
+        book = Book.objects.create(name='Book')
+        images = [BookImage.objects.create(book=book, name=name) for name in ('x', 'y')]
+        data = {
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '2',
+            'images-INITIAL_FORMS': '2',
+            'images-MAX_NUM_FORMS': '1000',
+        }
+        for i, image in enumerate(images):
+            data['images-%s-id' % i] = str(image.pk)
+            data['images-%s-name' % i] = image.name
+
+        class DroppingImagesMultiForm(BookImagesMultiForm):
+            def clean(self):
+                cleaned_data = super(DroppingImagesMultiForm, self).clean()
+                cleaned_data['images'] = [
+                    dict(row, name='changed') for row in cleaned_data['images']
+                    if row['id'] != images[0]
+                ]
+                return cleaned_data
+
+        form = DroppingImagesMultiForm(data, instance={'book': book})
+        self.assertTrue(form.is_valid(), form.errors)
+        rows = form.forms['images'].forms
+        # the form of the dropped row keeps its own data
+        self.assertEqual(rows[0].cleaned_data['id'], images[0])
+        self.assertEqual(rows[0].cleaned_data['name'], 'x')
+        self.assertEqual(rows[1].cleaned_data['id'], images[1])
+        self.assertEqual(rows[1].cleaned_data['name'], 'changed')
+
+    def test_setter(self):
+        form = BookImagesMultiForm({
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '2',
+            'images-INITIAL_FORMS': '0',
+            'images-MAX_NUM_FORMS': '1000',
+            'images-0-name': 'a',
+            'images-1-name': 'b',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        form.cleaned_data = {'images': [{'name': 'x'}, {'name': 'y'}]}
+        self.assertEqual([row['name'] for row in form.cleaned_data['images']], ['x', 'y'])
+
+
+class CleanedObjectsTest(TestCase):
+    data = {
+        'book-name': 'Book',
+        'images-TOTAL_FORMS': '1',
+        'images-INITIAL_FORMS': '0',
+        'images-MAX_NUM_FORMS': '1000',
+        'images-0-name': 'a',
+    }
+
+    def test_cached(self):
+        form = BookImagesMultiForm(self.data, instance={'book': Book()})
+        self.assertTrue(form.is_valid(), form.errors)
+        row = form.forms['images'].forms[0]
+        with mock.patch.object(row, 'save', wraps=row.save) as save:
+            objects = form.cleaned_objects
+            self.assertIs(form.cleaned_objects, objects)
+            book = form.save()
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(objects['book'], book)
+        self.assertEqual(objects['images'][0].book, book)
+
+    def test_invalidated(self):
+        form = BookImagesMultiForm(self.data, instance={'book': Book()})
+        self.assertTrue(form.is_valid(), form.errors)
+        objects = form.cleaned_objects
+        form.cleaned_data = form.cleaned_data
+        self.assertIsNot(form.cleaned_objects, objects)
+        objects = form.cleaned_objects
+        self.assertTrue(form.is_valid())
+        self.assertIsNot(form.cleaned_objects, objects)
+
+
+class BatchUniqueValidationTest(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(name='Book')
+        self.chapter = Chapter.objects.create(book=self.book, title='Intro', number=1)
+        self.data = {
+            'book-name': 'Book',
+            'chapters-TOTAL_FORMS': '4',
+            'chapters-INITIAL_FORMS': '1',
+            'chapters-MAX_NUM_FORMS': '1000',
+            'chapters-0-id': str(self.chapter.pk),
+            'chapters-0-book': str(self.book.pk),
+            'chapters-0-title': 'Intro',
+            'chapters-0-number': '1',
+            'chapters-1-title': 'Intro',
+            'chapters-1-number': '2',
+            'chapters-2-title': 'Middle',
+            'chapters-2-number': '1',
+            'chapters-3-title': 'End',
+            'chapters-3-number': '3',
+        }
+
+    def validate(self, form_class):
+        form = form_class(self.data, instance={'book': self.book})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(form.is_valid())
+        return form, len(queries)
+
+    def test_same_errors(self):
+        form, queries = self.validate(BookChaptersMultiForm)
+        batched_form, batched_queries = self.validate(BatchedBookChaptersMultiForm)
+
+        self.assertEqual(batched_form.errors, form.errors)
+        self.assertEqual(batched_form.forms['chapters'].errors, [
+            {},
+            {'title': ['Chapter with this Title already exists.']},
+            {'__all__': ['Chapter with this Book and Number already exists.']},
+            {},
+        ])
+        self.assertLess(batched_queries, queries)
+
+    def test_valid(self):
+        self.data.update({
+            'chapters-1-title': 'Beginning',
+            'chapters-2-number': '4',
+        })
+        form = BatchedBookChaptersMultiForm(self.data, instance={'book': self.book})
+        self.assertTrue(form.is_valid(), form.errors)
+        # the unique checks are not left deferred
+        row = form.forms['chapters'].forms[1]
+        self.assertNotIn('validate_unique', vars(row))
+
+
+    def test_case_insensitive_collation(self):
+        self.data.update({
+            'chapters-1-title': 'INTRO',
+            'chapters-2-number': '4',
+        })
+
+        def has_unique_conflict(instance, model_class, unique_check):
+            # a database comparing the titles case insensitively
+            return (
+                unique_check == ('title',) and instance.pk != self.chapter.pk and
+                instance.title.lower() == self.chapter.title.lower()
+            )
+
+        form = BatchedBookChaptersMultiForm(self.data, instance={'book': self.book})
+        with mock.patch('betterforms.utils._has_unique_conflict', side_effect=has_unique_conflict):
+            self.assertFalse(form.is_valid())
+        self.assertEqual(form.forms['chapters'].errors, [
+            {},
+            {'title': ['Chapter with this Title already exists.']},
+            {},
+            {},
+        ])
+
+
+class BatchChoiceResolutionTest(TestCase):
+    def setUp(self):
+        self.books = [Book.objects.create(name=name) for name in ('a', 'b', 'c')]
+        self.images = [BookImage.objects.create(book=self.books[0], name=name) for name in ('x', 'y', 'z')]
+        self.data = {
+            'images-TOTAL_FORMS': '3',
+            'images-INITIAL_FORMS': '3',
+            'images-MAX_NUM_FORMS': '1000',
+            'choices-TOTAL_FORMS': '3',
+            'choices-INITIAL_FORMS': '0',
+            'choices-MAX_NUM_FORMS': '1000',
+        }
+        for i, image in enumerate(self.images):
+            self.data.update({
+                'images-%s-id' % i: str(image.pk),
+                'images-%s-book' % i: str(self.books[i].pk),
+                'images-%s-name' % i: image.name,
+            })
+        for i, book in enumerate(self.books):
+            self.data.update({
+                'choices-%s-book' % i: str(book.pk),
+                'choices-%s-books' % i: [str(b.pk) for b in self.books[:i + 1]],
+            })
+
+    def render(self, form_class):
+        form = form_class(self.data)
+        with CaptureQueriesContext(connection) as queries:
+            html = str(form.forms['images']) + str(form.forms['choices'])
+        # the queries evaluating the choices, as opposed to the ones loading
+        # the rows and their initial values
+        queries = [q['sql'] for q in queries]
+        return html, len([q for q in queries if 'FROM "example_project_book"' in q and 'WHERE' not in q])
+
+    def test_shared_choices(self):
+        html, queries = self.render(ImageBooksMultiForm)
+        shared_html, shared_queries = self.render(SharedChoicesImageBooksMultiForm)
+        self.assertEqual(shared_html, html)
+        # one query per distinct field type and queryset: Book.objects.all()
+        # for the ModelChoiceFields of both children and for the
+        # ModelMultipleChoiceFields
+        self.assertEqual(shared_queries, 2)
+        self.assertEqual(queries, 9)
+
+    def test_shared_choices_queryset_changed(self):
+        def render(form_class):
+            form = form_class(self.data)
+            form.forms['images'][0].fields['book'].queryset = Book.objects.filter(pk=self.books[1].pk)
+            return [str(row['book']) for row in form.forms['images']]
+
+        html = render(ImageBooksMultiForm)
+        self.assertEqual(render(SharedChoicesImageBooksMultiForm), html)
+        option = 'value="%s"' % self.books[2].pk
+        self.assertNotIn(option, html[0])
+        self.assertIn(option, html[1])
+
+    def test_shared_choices_label_from_instance(self):
+        html, queries = self.render(LabeledImageBooksMultiForm)
+        shared_html, shared_queries = self.render(SharedChoicesLabeledImageBooksMultiForm)
+        self.assertEqual(shared_html, html)
+        self.assertIn('Labeled a', html)
+        # the labeled ModelChoiceFields get their own choices
+        self.assertEqual(shared_queries, 3)
+
+    def validate(self, form_class, data):
+        form = form_class(data)
+        with CaptureQueriesContext(connection) as queries:
+            form.is_valid()
+        return form, len(queries)
+
+    def test_same_result(self):
+        form, queries = self.validate(ImageBooksMultiForm, self.data)
+        batched_form, batched_queries = self.validate(BatchedImageBooksMultiForm, self.data)
+        self.assertTrue(batched_form.is_valid(), batched_form.errors)
+
+        rows = batched_form.forms['images'].forms
+        self.assertEqual([row.cleaned_data['book'] for row in rows], self.books)
+        self.assertEqual([row.cleaned_data['id'] for row in rows], self.images)
+        rows = batched_form.forms['choices'].forms
+        self.assertEqual([list(row.cleaned_data['books']) for row in rows],
+                         [list(form.cleaned_data['books']) for form in form.forms['choices'].forms])
+        self.assertLess(batched_queries, queries)
+
+        # the fields are restored
+        self.assertNotIn('to_python', vars(rows[0].fields['book']))
+
+    def test_same_errors(self):
+        data = dict(self.data, **{
+            'images-1-book': '0',
+            'images-2-book': 'foo',
+            'choices-1-book': '',
+            'choices-2-books': [str(self.books[0].pk), '0'],
+        })
+        form, queries = self.validate(ImageBooksMultiForm, data)
+        batched_form, batched_queries = self.validate(BatchedImageBooksMultiForm, data)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(batched_form.errors, form.errors)
+        self.assertEqual(batched_form.forms['images'].errors, form.forms['images'].errors)
+        self.assertEqual(batched_form.forms['choices'].errors, form.forms['choices'].errors)
+
+
+class FormsetRowBudgetTest(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(name='a')
+        self.data = {
+            'images-TOTAL_FORMS': '0',
+            'images-INITIAL_FORMS': '0',
+            'images-MAX_NUM_FORMS': '1000',
+            'choices-TOTAL_FORMS': '3',
+            'choices-INITIAL_FORMS': '0',
+            'choices-MAX_NUM_FORMS': '1000',
+        }
+        for i in range(1000):
+            self.data['choices-%s-book' % i] = str(self.book.pk)
+
+    def test_within_budget(self):
+        form = LimitedImageBooksMultiForm(self.data)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.forms['choices'].cleaned_data), 3)
+
+    def test_child_budget(self):
+        self.data['choices-TOTAL_FORMS'] = '4'
+        with mock.patch.object(BookChoiceForm, '__init__') as init:
+            form = LimitedImageBooksMultiForm(self.data)
+            self.assertFalse(form.is_valid())
+        self.assertFalse(init.called)
+        self.assertFalse(form.forms['choices'].is_bound)
+        self.assertTrue(form.forms['images'].is_bound)
+        self.assertEqual(form.non_field_errors(), [
+            'Too many rows were submitted for choices, at most 3 are accepted.',
+        ])
+
+    def test_total_budget(self):
+        self.data['images-TOTAL_FORMS'] = '1000'
+        with mock.patch.object(BookChoiceForm, '__init__') as init:
+            form = LimitedImageBooksMultiForm(self.data)
+            self.assertFalse(form.is_valid())
+        self.assertFalse(init.called)
+        self.assertFalse(form.forms['choices'].is_bound)
+        self.assertFalse(form.forms['images'].is_bound)
+        self.assertEqual(form.non_field_errors(), [
+            'Too many rows were submitted, at most 5 are accepted in total.',
+        ])
+
+    def test_unbound(self):
+        form = LimitedImageBooksMultiForm()
+        self.assertEqual(form.crossform_errors, [])
+
+
+class NestedDataTest(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(name='Book')
+        self.images = [BookImage.objects.create(book=self.book, name=name) for name in ('a', 'b')]
+
+    def test_save(self):
+        form = NestedBookImagesMultiForm({
+            'book': {'name': 'New name'},
+            'images': [
+                {'id': self.images[0].pk, 'name': 'a2'},
+                {'id': self.images[1].pk, 'name': 'b', 'DELETE': True},
+                {'name': 'c'},
+            ],
+        }, instance={'book': self.book})
+        self.assertTrue(form.is_valid(), form.nested_errors())
+        self.assertEqual(form.nested_errors(), {})
+        self.assertEqual(form.forms['images'].initial_form_count(), 2)
+
+        book = form.save()
+        self.assertEqual(Book.objects.get().name, 'New name')
+        self.assertEqual(sorted(book.images.values_list('name', flat=True)), ['a2', 'c'])
+
+    def test_same_result_as_flat_data(self):
+        flat_form = BookImagesMultiForm({
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '1',
+            'images-INITIAL_FORMS': '0',
+            'images-0-name': 'c',
+        }, instance={'book': Book()})
+        form = NestedBookImagesMultiForm({
+            'book': {'name': 'Book'},
+            'images': [{'name': 'c'}],
+        }, instance={'book': Book()})
+        self.assertTrue(form.is_valid())
+        self.assertTrue(flat_form.is_valid())
+        self.assertEqual(form.cleaned_data['book'], flat_form.cleaned_data['book'])
+        self.assertEqual(
+            [dict(row, book=None) for row in form.cleaned_data['images']],
+            [dict(row, book=None) for row in flat_form.cleaned_data['images']],
+        )
+
+    def test_errors(self):
+        form = NestedBookImagesMultiForm({
+            'book': {'name': ''},
+            'images': [
+                {'id': self.images[0].pk, 'name': 'a'},
+                {'name': 'x' * 300},
+            ],
+        }, instance={'book': self.book})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.nested_errors(), {
+            'book': {'name': ['This field is required.']},
+            'images': [
+                {},
+                {'name': ['Ensure this value has at most 255 characters (it has 300).']},
+            ],
+        })
+
+    def test_invalid_shape(self):
+        form = NestedBookImagesMultiForm({
+            'book': {'name': 'Book'},
+            'images': {'name': 'c'},
+        }, instance={'book': self.book})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.nested_errors(), {
+            NON_FIELD_ERRORS: ['Expected a list of rows for images.'],
+        })
+
+    def test_primary_key_after_new_row(self):
+        form = NestedBookImagesMultiForm({
+            'book': {'name': 'Book'},
+            'images': [
+                {'name': 'c'},
+                {'id': self.images[0].pk, 'name': 'a'},
+            ],
+        }, instance={'book': self.book})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.nested_errors(), {
+            NON_FIELD_ERRORS: ['Rows with a primary key must come first in images.'],
+        })
+        self.assertEqual(BookImage.objects.count(), 2)
@@ -0,0 +1,101 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from django import forms
+from django.forms.models import inlineformset_factory
+
+from betterforms.multiform import MultiModelFormMixin
+
+from ..models import User, Profile, Book, BookImage
+
+from .utils import TestCase
+
+
+constructions = {}
+
+
+class CountingMixin(object):
+    counter_key = None
+
+    def __init__(self, *args, **kwargs):
+        constructions[self.counter_key] = constructions.get(self.counter_key, 0) + 1
+        super(CountingMixin, self).__init__(*args, **kwargs)
+
+
+class CountingUserForm(CountingMixin, forms.ModelForm):
+    counter_key = 'user'
+
+    class Meta:
+        model = User
+        fields = ('name',)
+
+
+class CountingProfileForm(CountingMixin, forms.ModelForm):
+    counter_key = 'profile'
+
+    class Meta:
+        model = Profile
+        fields = ('display_name',)
+
+
+class CountingBookImageForm(CountingMixin, forms.ModelForm):
+    counter_key = 'rows'
+
+    class Meta:
+        model = BookImage
+        fields = ('name',)
+
+
+class CountingFormSet(CountingMixin, forms.BaseInlineFormSet):
+    counter_key = 'formset'
+
+
+CountingImageFormSet = inlineformset_factory(
+    Book, BookImage, form=CountingBookImageForm, formset=CountingFormSet, fields=('name',), extra=0)
+
+
+class CountingMultiForm(MultiModelFormMixin):
+    form_classes = OrderedDict((
+        ('user', CountingUserForm),
+        ('profile', CountingProfileForm),
+        ('images', CountingImageFormSet),
+    ))
+
+
+class ConstructionCountTest(TestCase):
+    def setUp(self):
+        constructions.clear()
+
+    def assertConstructions(self, **expected):
+        self.assertEqual(constructions, expected)
+
+    def test_unbound(self):
+        form = CountingMultiForm(instance={'images': Book()})
+        self.assertConstructions()
+        form.as_p()
+        self.assertConstructions(user=1, profile=1, formset=1)
+
+    def test_lazy_lookup(self):
+        form = CountingMultiForm(instance={'images': Book()})
+        self.assertEqual(form['user_name'].name, 'name')
+        self.assertConstructions(user=1)
+        self.assertEqual(form['display_name'].name, 'display_name')
+        self.assertEqual(form['user_form'], form.forms['user'])
+        self.assertConstructions(user=1, profile=1)
+        form['images_formset']
+        self.assertConstructions(user=1, profile=1, formset=1)
+
+    def test_bound(self):
+        form = CountingMultiForm({
+            'user-name': 'foo',
+            'profile-display_name': 'bar',
+            'images-TOTAL_FORMS': '2',
+            'images-INITIAL_FORMS': '0',
+            'images-MAX_NUM_FORMS': '1000',
+            'images-0-name': 'a',
+            'images-1-name': 'b',
+        }, instance={'images': Book()})
+        self.assertTrue(form.is_valid())
+        self.assertConstructions(user=1, profile=1, formset=1, rows=2)
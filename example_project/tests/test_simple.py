@@ -1,20 +1,51 @@
+import copy
+import datetime
+import pickle
+import sys
+import threading
+import unittest
 from collections import OrderedDict
 
+import mock
+
+from django import forms
+from django.forms.models import modelform_factory
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from django.test import TransactionTestCase
 from django.test.client import RequestFactory
 from django.views.generic import CreateView
 from django.core import urlresolvers
+from django.utils import timezone
 from django.utils.encoding import force_text
 
-from ..models import User, Profile, Badge, Book
+from betterforms.multiform import AMBIGUOUS, MultiFormMixin, MultiModelFormMixin, ThreadPoolExecutor
+
+from ..models import User, Profile, Badge, Book, BookImage
 from ..forms import (
     UserProfileMultiForm, BadgeMultiForm, ErrorMultiForm,
     MixedForm, NeedsFileField, ManyToManyMultiForm, Step2Form,
     BookMultiForm, RaisesErrorCustomCleanMultiform,
-    ModifiesDataCustomCleanMultiform,
+    ModifiesDataCustomCleanMultiform, UserMetaMultiForm, ParallelErrorMultiForm,
+    RaisesErrorForm, BookForm, WideMultiForm, PrototypeWideMultiForm, PartitionedNeedsFileField,
+    ImageBooksMultiForm, PartitionedImageBooksMultiForm, DateTimeMultiForm, ParallelDateTimeMultiForm,
+    BookModelMultiform,
 )
 
 from .utils import TestCase
 
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+if sys.version_info >= (3, 5):
+    from .async_forms import AsyncMultiForm, OrderedValidationMultiForm, run
+else:
+    AsyncMultiForm = OrderedValidationMultiForm = run = None
+
 
 class MultiFormTest(TestCase):
     def test_initial_data(self):
@@ -88,6 +119,66 @@ class MultiFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertEqual(form.non_field_errors().as_text(), '* It broke\n* It broke')
 
+    @unittest.skipIf(ThreadPoolExecutor is None, 'concurrent.futures is not available')
+    def test_parallel_validation(self):
+        threads = []
+        clean = RaisesErrorForm.clean
+
+        def recording_clean(form):
+            threads.append(threading.current_thread())
+            return clean(form)
+
+        with mock.patch.object(RaisesErrorForm, 'clean', recording_clean):
+            serial = ErrorMultiForm(data={})
+            self.assertFalse(serial.is_valid())
+            self.assertEqual(set(threads), set([threading.current_thread()]))
+
+            del threads[:]
+            form = ParallelErrorMultiForm(data={})
+            self.assertFalse(form.is_valid())
+            self.assertEqual(len(threads), 2)
+            self.assertNotIn(threading.current_thread(), threads)
+
+        self.assertEqual(
+            dict((key, errors.as_text()) for key, errors in form.errors.items()),
+            dict((key, errors.as_text()) for key, errors in serial.errors.items()),
+        )
+        self.assertEqual(form.non_field_errors().as_text(), '* It broke\n* It broke')
+
+    @unittest.skipIf(ThreadPoolExecutor is None, 'concurrent.futures is not available')
+    def test_parallel_validation_connections(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+
+        # the connections of a configured, long-lived executor are kept
+        # unless they are obsolete
+        form = ParallelErrorMultiForm(data={})
+        form.validation_executor = executor
+        with mock.patch('betterforms.multiform.close_old_connections') as close_old, \
+                mock.patch('betterforms.multiform.connections') as connections:
+            form.is_valid()
+        self.assertEqual(close_old.call_count, 2)
+        self.assertFalse(connections.all.called)
+
+        # the ones of the threads of a per-call pool are closed
+        form = ParallelErrorMultiForm(data={})
+        with mock.patch('betterforms.multiform.close_old_connections') as close_old, \
+                mock.patch('betterforms.multiform.connections') as connections:
+            form.is_valid()
+        self.assertFalse(close_old.called)
+        self.assertEqual(connections.all.call_count, 2)
+
+    @unittest.skipIf(ThreadPoolExecutor is None, 'concurrent.futures is not available')
+    def test_parallel_validation_timezone(self):
+        data = {'first-date': '2020-01-01 12:00', 'second-date': '2020-01-01 12:00'}
+        with self.settings(USE_TZ=True), timezone.override(timezone.get_fixed_timezone(540)):
+            serial = DateTimeMultiForm(data)
+            self.assertTrue(serial.is_valid())
+            form = ParallelDateTimeMultiForm(data)
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data, serial.cleaned_data)
+        self.assertEqual(form.cleaned_data['second']['date'].utcoffset(), datetime.timedelta(hours=9))
+
     def test_is_multipart(self):
         form1 = ErrorMultiForm()
         self.assertFalse(form1.is_multipart())
@@ -150,6 +241,133 @@ class MultiFormTest(TestCase):
             }),
         ]))
 
+    def test_field_form_map_is_shared(self):
+        form1 = UserProfileMultiForm()
+        form2 = UserProfileMultiForm()
+        self.assertIs(form1.field_form_map, form2.field_form_map)
+        self.assertEqual(form1.field_form_map['display_name'], 'profile')
+        self.assertEqual(form1.field_form_map['user_name'], 'user')
+        self.assertRaises(TypeError, form1.field_form_map.update, {})
+        field_form_map = copy.copy(form1.field_form_map)
+        field_form_map['foo'] = 'user'
+        self.assertNotIn('foo', form1.field_form_map)
+
+        form3 = UserProfileMultiForm(prefix='foo')
+        self.assertIsNot(form3.field_form_map, form1.field_form_map)
+        self.assertEqual(form3.field_form_map['profile_foo_display_name'], 'profile')
+
+    def test_per_instance_form_classes_are_not_cached(self):
+        class PerInstanceMultiForm(MultiFormMixin):
+            prototype_fields = True
+
+            def get_form_classes(self, *args, **kwargs):
+                return OrderedDict((
+                    ('errors', RaisesErrorForm),
+                    ('rows', forms.formset_factory(RaisesErrorForm)),
+                ))
+
+        for i in range(3):
+            form = PerInstanceMultiForm()
+            self.assertEqual(form.field_form_map['errors_name'], 'errors')
+            self.assertEqual(form.lookup_index['rows_formset'], ('rows',))
+            self.assertIsInstance(form.forms['rows'].forms[0], RaisesErrorForm)
+        self.assertNotIn('_field_form_maps', vars(PerInstanceMultiForm))
+        self.assertNotIn('_lookup_indexes', vars(PerInstanceMultiForm))
+        self.assertNotIn('_prototype_classes', vars(PerInstanceMultiForm))
+
+    def test_formfield_callback_classes_are_not_cached(self):
+        class CallbackMultiForm(MultiModelFormMixin):
+            default_form_key = 'book'
+            form_classes = OrderedDict((
+                ('book', BookForm),
+                ('errors', RaisesErrorForm),
+            ))
+
+            class Meta:
+                model = Book
+                fields = ('name',)
+
+            def formfield_callback(self, field, **kwargs):
+                return field.formfield(**kwargs)
+
+        for i in range(3):
+            with mock.patch('betterforms.multiform.modelform_factory', wraps=modelform_factory) as factory:
+                form = CallbackMultiForm()
+                self.assertEqual(form.lookup_index['book_name'], ('book',))
+                list(form.forms.values())
+            # every child class is built once
+            self.assertEqual(factory.call_count, 1)
+            self.assertIs(type(form.forms['book']), form._get_built_form_class('book'))
+        self.assertNotIn('_lookup_indexes', vars(CallbackMultiForm))
+
+    def test_lookup_index(self):
+        form = UserProfileMultiForm()
+        self.assertEqual(form.lookup_index['user_form'], ('user',))
+        self.assertEqual(form.lookup_index['profile_display_name'], ('profile',))
+        self.assertIs(form.lookup_index['name'], AMBIGUOUS)
+
+        self.assertRaises(KeyError, form.__getitem__, 'name')
+        self.assertFalse(form.forms.is_built('user'))
+        self.assertIs(form['user_name'], form['user_name'])
+        self.assertIs(form['user_name'].form, form.forms['user'])
+        self.assertIs(form['display_name'], form['profile_display_name'])
+
+    def test_fields_view(self):
+        form = UserMetaMultiForm()
+        fields = form.fields
+        self.assertIs(form.fields, fields)
+        self.assertEqual(sorted(fields), ['badge_color', 'badge_name', 'user_name'])
+        self.assertIs(fields['user_name'], form['user_name'])
+
+        fields['extra'] = forms.CharField()
+        self.assertIn('extra', form.forms['user'].fields)
+        self.assertIs(form['extra'].form, form.forms['user'])
+        self.assertEqual(len(fields), 4)
+
+    def test_cleaned_data_is_cached(self):
+        form = UserProfileMultiForm({
+            'user-name': 'foo',
+            'profile-name': 'foo',
+        })
+        self.assertTrue(form.is_valid())
+        cleaned_data = form.cleaned_data
+        with mock.patch.object(form.forms['user'], 'is_valid') as is_valid:
+            self.assertIs(form.cleaned_data, cleaned_data)
+            self.assertFalse(is_valid.called)
+
+        form.cleaned_data = {'user': {'name': 'bar'}}
+        self.assertIsNot(form.cleaned_data, cleaned_data)
+        self.assertEqual(form.cleaned_data['user'], {'name': 'bar'})
+
+        cleaned_data = form.cleaned_data
+        form.add_crossform_error(ValidationError('It broke'))
+        self.assertIsNot(form.cleaned_data, cleaned_data)
+
+    def test_base_fields(self):
+        base_fields = BookMultiForm.base_fields
+        self.assertIs(BookMultiForm.base_fields, base_fields)
+
+        # the standard Django idiom of copying the base fields still works
+        for copied in (copy.copy(base_fields), copy.deepcopy(base_fields)):
+            copied['extra'] = None
+            self.assertEqual(sorted(copied), sorted(list(base_fields) + ['extra']))
+        fields = copy.deepcopy(base_fields)
+        self.assertIsNot(fields['book_name'], base_fields['book_name'])
+        self.assertEqual(pickle.loads(pickle.dumps(BookMultiForm().field_form_map)),
+                         dict(BookMultiForm().field_form_map))
+        self.assertEqual(
+            sorted(base_fields),
+            ['book_name', 'error_hidden', 'error_name', 'images_name'],
+        )
+
+        class TestMultiForm(BookMultiForm):
+            pass
+
+        self.assertEqual(TestMultiForm.base_fields, base_fields)
+        TestMultiForm.form_classes = {'book': BookMultiForm.form_classes['book']}
+        self.assertEqual(list(TestMultiForm.base_fields), ['book_name'])
+        self.assertIs(BookMultiForm.base_fields, base_fields)
+
     def test_handles_none_initial_value(self):
         # Used to throw an AttributeError
         UserProfileMultiForm(initial=None)
@@ -211,6 +429,221 @@ class MultiFormTest(TestCase):
         ]))
 
 
+class PartitionDataTest(TestCase):
+    def test_files(self):
+        data = {
+            'csrfmiddlewaretoken': 'token',
+            'file-hidden': 'foo',
+            'errors-name': 'foo',
+            'errors-hidden': 'bar',
+        }
+        files = MultiValueDict({'file-image': [SimpleUploadedFile('image.png', b'not an image')]})
+        form = NeedsFileField(data, files)
+        partitioned_form = PartitionedNeedsFileField(data, files)
+        self.assertEqual(partitioned_form.forms['errors'].errors, form.forms['errors'].errors)
+
+        self.assertEqual(partitioned_form.forms['file'].data, {'file-hidden': 'foo'})
+        self.assertEqual(list(partitioned_form.forms['file'].files), ['file-image'])
+        self.assertEqual(partitioned_form.forms['errors'].data, {'errors-name': 'foo', 'errors-hidden': 'bar'})
+        self.assertEqual(len(partitioned_form.forms['errors'].files), 0)
+        self.assertTrue(partitioned_form.forms['errors'].is_bound)
+
+    def test_formsets(self):
+        books = [Book.objects.create(name=name) for name in ('a', 'b')]
+        data = QueryDict('', mutable=True)
+        data.update({
+            'images-TOTAL_FORMS': '0',
+            'images-INITIAL_FORMS': '0',
+            'choices-TOTAL_FORMS': '2',
+            'choices-INITIAL_FORMS': '0',
+            'choices-0-book': str(books[0].pk),
+            'choices-1-book': str(books[1].pk),
+        })
+        data.setlist('choices-1-books', [str(book.pk) for book in books])
+        form = ImageBooksMultiForm(data)
+        partitioned_form = PartitionedImageBooksMultiForm(data)
+        self.assertTrue(partitioned_form.is_valid(), partitioned_form.errors)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(
+            [row['book'] for row in partitioned_form.cleaned_data['choices']],
+            [row['book'] for row in form.cleaned_data['choices']],
+        )
+        self.assertEqual(list(partitioned_form.cleaned_data['choices'][1]['books']), books)
+        self.assertEqual(sorted(partitioned_form.forms['images'].data), ['images-INITIAL_FORMS', 'images-TOTAL_FORMS'])
+
+
+class PrototypeFieldsTest(TestCase):
+    def setUp(self):
+        self.books = [Book.objects.create(name=name) for name in ('a', 'b')]
+
+    def test_same_html(self):
+        self.assertHTMLEqual(str(PrototypeWideMultiForm()), str(WideMultiForm()))
+
+    def test_same_errors(self):
+        data = {
+            'choices-TOTAL_FORMS': '2',
+            'choices-INITIAL_FORMS': '0',
+            'choices-MAX_NUM_FORMS': '1000',
+            'choices-0-book': str(self.books[0].pk),
+            'choices-1-book': '0',
+            'wide-field1': '3',
+            'wide-field2': '42',
+        }
+        form = WideMultiForm(data)
+        prototype_form = PrototypeWideMultiForm(data)
+        self.assertFalse(prototype_form.is_valid())
+        self.assertEqual(prototype_form.errors, form.errors)
+        self.assertEqual(prototype_form.forms['choices'][0].cleaned_data['book'], self.books[0])
+
+    def test_changes_are_not_shared(self):
+        form = PrototypeWideMultiForm()
+        fields = form.forms['wide'].fields
+        self.assertEqual(fields['field0'].help_text, 'changed in __init__')
+        fields['field1'].required = False
+        fields['field1'].choices = [('a', 'A')]
+        fields['field2'].widget.attrs['class'] = 'wide'
+        row = form.forms['choices'][0]
+        row.fields['book'].queryset = Book.objects.filter(pk=self.books[0].pk)
+        self.assertEqual(len(list(row.fields['book'].widget.choices)), 2)
+
+        other = PrototypeWideMultiForm()
+        fields = other.forms['wide'].fields
+        self.assertTrue(fields['field1'].required)
+        self.assertEqual(len(fields['field1'].widget.choices), 10)
+        self.assertNotIn('class', fields['field2'].widget.attrs)
+        self.assertEqual(len(list(other.forms['choices'][0].fields['book'].widget.choices)), 3)
+
+        self.assertEqual(str(other), str(WideMultiForm()))
+        self.assertIsInstance(fields['field1'], forms.ChoiceField)
+
+    @unittest.skipIf(tracemalloc is None, 'tracemalloc requires Python 3.4')
+    def test_allocations(self):
+        def build(form_class):
+            multiform = form_class()
+            multiform.forms['choices'].forms
+            multiform.forms['wide']
+            return multiform
+
+        def allocated(form_class):
+            build(form_class)
+            tracemalloc.start()
+            try:
+                # the multiforms are returned to stay alive until measured
+                multiforms = [build(form_class) for i in range(10)]
+                return tracemalloc.get_traced_memory()[0], multiforms
+            finally:
+                tracemalloc.stop()
+
+        # the bound fields indexed by the multiform are the same in both cases
+        self.assertLess(allocated(PrototypeWideMultiForm)[0], allocated(WideMultiForm)[0] / 1.5)
+
+
+@unittest.skipIf(AsyncMultiForm is None, 'async def requires Python 3.5')
+class AsyncMultiFormTest(TestCase):
+    data = {
+        'validated-name': 'bar',
+        'cleaned-name': 'bar',
+        'rows-TOTAL_FORMS': '1',
+        'rows-INITIAL_FORMS': '0',
+        'rows-MAX_NUM_FORMS': '1000',
+        'rows-0-name': 'bar',
+    }
+
+    def test_ais_valid(self):
+        form = AsyncMultiForm(self.data)
+        self.assertTrue(run(form.ais_valid))
+        self.assertEqual(form.cleaned_data['cleaned'], {'name': 'BAR'})
+        self.assertEqual(form.cleaned_data['rows'], [{'name': 'bar'}])
+
+    def test_async_validators(self):
+        data = dict(self.data, **{'validated-name': 'foo', 'rows-0-name': 'foo'})
+        form = AsyncMultiForm(data)
+        self.assertFalse(run(form.ais_valid))
+        self.assertEqual(form.errors['validated_name'], ['No foo'])
+        self.assertEqual(form.forms['rows'].errors, [{'name': ['No foo']}])
+        self.assertEqual(form.cleaned_data['cleaned'], {'name': 'BAR'})
+        self.assertEqual(run(form.afull_clean), form.errors)
+
+    def test_validation_order(self):
+        # like Django: field validators, clean_<field>(), then clean()
+        form = OrderedValidationMultiForm({'ordered-name': 'foo'})
+        self.assertFalse(run(form.ais_valid))
+        self.assertEqual(form.errors['ordered_name'], ['No foo'])
+        self.assertEqual(form.forms['ordered'].calls, [('clean', [])])
+
+        form = OrderedValidationMultiForm({'ordered-name': 'bar'})
+        self.assertTrue(run(form.ais_valid))
+        self.assertEqual(form.forms['ordered'].calls, ['clean_name', ('clean', ['name'])])
+        self.assertTrue(form.is_valid())
+
+    def test_async_clean(self):
+        form = AsyncMultiForm(dict(self.data, **{'validated-name': 'broken'}))
+        self.assertFalse(run(form.ais_valid))
+        self.assertEqual(form.non_field_errors().as_text(), '* It broke')
+
+    def test_timezone(self):
+        data = {'first-date': '2020-01-01 12:00', 'second-date': '2020-01-01 12:00'}
+        with self.settings(USE_TZ=True), timezone.override(timezone.get_fixed_timezone(540)):
+            serial = DateTimeMultiForm(data)
+            self.assertTrue(serial.is_valid())
+            form = DateTimeMultiForm(data)
+            self.assertTrue(run(form.ais_valid))
+        self.assertEqual(form.cleaned_data, serial.cleaned_data)
+        self.assertEqual(form.cleaned_data['second']['date'].utcoffset(), datetime.timedelta(hours=9))
+
+
+@unittest.skipIf(run is None, 'async def requires Python 3.5')
+class AsyncSaveTest(TransactionTestCase):
+    data = {
+        'user-name': 'foo',
+        'badge-name': 'badge',
+        'badge-color': 'blue',
+    }
+
+    def test_asave(self):
+        form = UserMetaMultiForm(self.data)
+        self.assertTrue(form.is_valid())
+
+        user = run(form.asave)
+        self.assertEqual(user, User.objects.get(name='foo'))
+        self.assertEqual(user.badge, Badge.objects.get(name='badge'))
+
+    def test_asave_commit_false(self):
+        form = UserMetaMultiForm(self.data)
+        self.assertTrue(form.is_valid())
+
+        objects = run(form.asave_multiform, False)
+        self.assertIsNone(objects['user'].pk)
+        self.assertIsNone(objects['badge'].pk)
+        self.assertFalse(User.objects.exists())
+        run(form.asave_m2m)
+
+
+@unittest.skipIf(run is None, 'async def requires Python 3.5')
+class AsyncMultiModelFormTest(TransactionTestCase):
+    def test_multiform_rows(self):
+        book = Book.objects.create(name='Book')
+        image = BookImage.objects.create(book=book, name='a')
+        data = {
+            'book-name': 'Book',
+            'images-TOTAL_FORMS': '1',
+            'images-INITIAL_FORMS': '1',
+            'images-MAX_NUM_FORMS': '1000',
+            'images-0-id': str(image.pk),
+            'images-0-book': str(book.pk),
+            'images-0-name': 'b',
+            'example_images-0-TOTAL_FORMS': '1',
+            'example_images-0-INITIAL_FORMS': '0',
+            'example_images-0-MAX_NUM_FORMS': '1000',
+            'example_images-0-0-field1': 'c',
+        }
+        serial = BookModelMultiform(data, instance={'book': book})
+        self.assertTrue(serial.is_valid(), serial.errors)
+        form = BookModelMultiform(data, instance={'book': book})
+        self.assertTrue(run(form.ais_valid), form.errors)
+        self.assertEqual(form.cleaned_data, serial.cleaned_data)
+
+
 class MultiModelFormTest(TestCase):
     def test_save(self):
         form = BadgeMultiForm({
@@ -266,6 +699,31 @@ class MultiModelFormTest(TestCase):
         self.assertEqual(form['user_form'].instance, user)
         self.assertEqual(form['profile_form'].instance, profile)
 
+    def test_model_form_class_cache(self):
+        UserMetaMultiForm.clear_form_class_cache()
+        form1 = UserMetaMultiForm()
+        form2 = UserMetaMultiForm()
+        user_form_class = type(form1.forms['user'])
+        self.assertIs(type(form2.forms['user']), user_form_class)
+        self.assertIsInstance(form1.forms['user'].fields['name'].widget, forms.Textarea)
+
+        UserMetaMultiForm.clear_form_class_cache('user')
+        form3 = UserMetaMultiForm()
+        self.assertIsNot(type(form3.forms['user']), user_form_class)
+        self.assertIsInstance(form3.forms['user'].fields['name'].widget, forms.Textarea)
+
+    def test_save_changes_outside_form(self):
+        user = User.objects.create(name='foo', email='old@example.com')
+        form = UserMetaMultiForm({
+            'user-name': 'foo',
+            'badge-name': 'badge',
+            'badge-color': 'blue',
+        }, instance={'user': user})
+        self.assertTrue(form.is_valid())
+        form.cleaned_objects['user'].email = 'new@example.com'
+        form.save()
+        self.assertEqual(User.objects.get(pk=user.pk).email, 'new@example.com')
+
     def test_model_and_non_model_forms(self):
         # This tests that it is possible to instantiate a non-model form using
         # the MultiModelForm class too, previously it would explode because it
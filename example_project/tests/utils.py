@@ -6,5 +6,5 @@ import unittest
 from django.test import TestCase as DjangoTestCase
 
 
-class TestCase(type(b"TestCase", (DjangoTestCase,), {}), unittest.TestCase):
+class TestCase(type(str("TestCase"), (DjangoTestCase,), {}), unittest.TestCase):
     pass